@@ -1,250 +1,284 @@
 import streamlit as st
-import numpy as np
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import torch
-import requests
 from bs4 import BeautifulSoup
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from transformers import pipeline
+from assessment_store import AssessmentStore
+from explanations import ExplanationStore
+from inference_service import BatchingClassifier
+from metrics import metrics, start_file_exporter, start_http_exporter
+import model_loading
+from model_loading import ModelLoader, CHATBOT_MODEL
+from radar_chart import RadarChartCache
+from resources import ResourceFetcher
+from speculative import SpeculativeRunner, chain
+from token_table import TokenTable
+from questionnaire import questions, sections, thresholds, class_names, frequency_labels, analyze_responses, encode_responses, responses_key
 
-# Load models
+# Run the BERT classifier with int8 dynamic quantization (CPU only)
+BERT_INT8_QUANTIZATION = False
+
+# How answers are turned into BERT input text (see questionnaire.encoding_modes).
+# Compact modes need a classifier retrained on that encoding (notebook Step 7.3)
+BERT_INPUT_ENCODING = "full"
+
+def bert_model_path():
+    """Classifier directory matching BERT_INPUT_ENCODING"""
+    if BERT_INPUT_ENCODING != "full":
+        return f"mental_health_bert_model_{BERT_INPUT_ENCODING}"
+    return "mental_health_bert_model"
+
+# Load models (in the background, both at once)
 @st.cache_resource
 def load_models():
-    bert_model_path = "mental_health_bert_model"
-    bert_tokenizer = AutoTokenizer.from_pretrained(bert_model_path)
-    bert_model = AutoModelForSequenceClassification.from_pretrained(bert_model_path)
-    chatbot = pipeline("text2text-generation", model="facebook/blenderbot-400M-distill")
-    return bert_tokenizer, bert_model, chatbot
-
-# Define questionnaire
-questions = [
-    # Section A: Mood and Energy
-    "I feel sad, empty, or hopeless",
-    "I have little interest or pleasure in doing things",
-    "I feel guilty or that I'm a failure",
-    "I have thoughts that I would be better off dead or of hurting myself",
-    "I feel unusually high, energetic, or euphoric (extremely happy)",
-    "I need less sleep than usual but still don't feel tired",
-    "My thoughts race and I can't slow my mind down",
-    "I'm more talkative than usual or feel pressure to keep talking",
-    
-    # Section B: Anxiety and Stress
-    "I feel nervous, anxious, or on edge",
-    "I can't stop or control worrying",
-    "I have difficulty relaxing",
-    "I feel afraid as if something awful might happen",
-    "I feel overwhelmed by my responsibilities",
-    "I have physical symptoms like racing heart, sweating, or shortness of breath",
-    "I avoid situations or places that make me anxious",
-    
-    # Section C: Behavioral Patterns
-    "My mood changes dramatically and unpredictably",
-    "I engage in impulsive behaviors I later regret (spending money, risky sex, substance use)",
-    "I have intense and unstable relationships with others",
-    "I have difficulty controlling my anger",
-    "I feel disconnected from myself or my surroundings",
-    "I experience extreme reactions to perceived abandonment",
-    "I feel empty inside much of the time",
-    
-    # Section D: Thought Patterns
-    "I have recurring unwanted thoughts that cause anxiety",
-    "I engage in repetitive behaviors to reduce anxiety",
-    "I'm suspicious of others' intentions toward me",
-    "I have unusual beliefs or experiences others don't share",
-    "I have difficulty concentrating or making decisions",
-    "I'm excessively concerned with order, details, or rules",
-    "I'm preoccupied with my appearance or perceived flaws",
-    
-    # Section E: Social and Functional Impact
-    "I withdraw from social activities",
-    "I have difficulty performing at work or school",
-    "I have trouble maintaining personal relationships",
-    "I neglect my self-care or household responsibilities",
-    "I use alcohol or drugs to cope with my feelings",
-    "I have changes in my appetite or weight"
-]
-
-# Section indices
-sections = {
-    "Depression": [0, 1, 2, 3],
-    "Bipolar": [4, 5, 6, 7],
-    "Anxiety": [8, 9, 10, 11, 12, 13, 14],
-    "Personality Disorders": [15, 16, 17, 18, 19, 20, 21],
-    "OCD and Thought Issues": [22, 23, 24, 25, 26, 27, 28],
-    "Functional Impact": [29, 30, 31, 32, 33, 34]
-}
-
-# Thresholds for each condition
-thresholds = {
-    "Depression": 6,  # Out of 12 (4 questions, max 3 each)
-    "Suicidal": 2,    # Question 4 alone, if ≥ 2
-    "Bipolar": 8,     # Out of 12 (4 questions, max 3 each)
-    "Anxiety": 10,    # Out of 21 (7 questions, max 3 each)
-    "Personality Disorders": 10,  # Out of 21 (7 questions, max 3 each)
-    "OCD": 6,         # Questions 22-23, if sum ≥ 6
-    "Normal": float('inf')  # Default if others aren't met
-}
-
-def analyze_responses(responses):
-    scores = {}
-    
-    # Calculate section scores
-    for condition, indices in sections.items():
-        scores[condition] = sum(responses[i] for i in indices)
-    
-    # Special case for suicidal ideation (question index 3)
-    scores["Suicidal"] = responses[3]
-    
-    # Determine conditions meeting thresholds
-    potential_conditions = []
-    for condition, threshold in thresholds.items():
-        if condition in scores and scores[condition] >= threshold:
-            potential_conditions.append((condition, scores[condition]))
-    
-    # If no conditions meet thresholds, consider "Normal"
-    if not potential_conditions:
-        return "Normal", scores
-    
-    # Sort by score (highest first)
-    potential_conditions.sort(key=lambda x: x[1], reverse=True)
-    
-    # Return the condition with highest score
-    primary_condition = potential_conditions[0][0]
-    
-    return primary_condition, scores
+    return ModelLoader(bert_model_path(), CHATBOT_MODEL, quantize_bert=BERT_INT8_QUANTIZATION)
 
-def responses_to_text(responses):
-    """Convert numerical responses to text for BERT model"""
-    frequency = ["Not at all", "Several days", "More than half the days", "Nearly every day"]
-    text_responses = [f"{questions[i]}: {frequency[min(r, 3)]}" for i, r in enumerate(responses)]
-    return " ".join(text_responses)
+# Micro-batching settings for the shared BERT inference worker
+INFERENCE_MAX_BATCH_SIZE = 16
+INFERENCE_MAX_WAIT_MS = 0
 
-def get_online_resources(condition):
-    """Fetch online resources and advice for the given condition"""
+def build_inference_service(bert):
+    bert_tokenizer, bert_model = bert
+    # Build model inputs from precomputed question/answer token IDs when they
+    # reproduce the tokenizer exactly, otherwise tokenize the encoded text
+    token_table = None
+    if BERT_INPUT_ENCODING != "sections":
+        token_table = TokenTable(bert_tokenizer, max_length=512, mode=BERT_INPUT_ENCODING)
+    if token_table is not None and token_table.verify():
+        encode = token_table.encode_batch
+    else:
+        def encode(batch):
+            texts = [encode_responses(responses, BERT_INPUT_ENCODING) for responses in batch]
+            return bert_tokenizer(texts, return_tensors="pt", truncation=True, padding=True, max_length=512)
+    return BatchingClassifier(bert_model, encode,
+                              max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+                              max_wait_ms=INFERENCE_MAX_WAIT_MS)
+
+# Generation budget for chatbot explanations (tokens, including the start token)
+EXPLANATION_MAX_LENGTH = 300
+# Show uncached explanations token by token while they are generated. Streamers
+# don't support beam search (blenderbot's default), so this decodes greedily
+STREAM_EXPLANATIONS = True
+
+def explanation_generation_kwargs():
+    kwargs = {"max_length": EXPLANATION_MAX_LENGTH}
+    if STREAM_EXPLANATIONS:
+        # Same settings for get(), stream() and the cache key
+        kwargs["num_beams"] = 1
+    return kwargs
+
+def build_explanation_store(chatbot):
+    # Explanations persist on disk; generate the missing ones in the background
+    store = ExplanationStore(chatbot, **explanation_generation_kwargs())
+    store.prewarm()
+    return store
+
+@st.cache_resource
+def load_inference_service():
+    """Future resolving to the BERT inference service once BERT has loaded"""
+    return load_models().after("bert", build_inference_service)
+
+@st.cache_resource
+def load_explanation_store():
+    """Future resolving to the explanation store once the chatbot has loaded"""
+    return load_models().after("chatbot", build_explanation_store)
+
+def failed(future):
+    return future.done() and future.exception() is not None
+
+def retry_failed_loads(model_loader):
+    """Start failed loads again instead of keeping the cached failure
+
+    Runs before the futures are handed out, so a load that failed on an
+    earlier run (missing files, a download error, ...) is retried on this one.
+    """
+    restarted = model_loader.retry_failed()
+    retried = False
+    for name, load in (("bert", load_inference_service), ("chatbot", load_explanation_store)):
+        if name in restarted or failed(load()):
+            load.clear()
+            retried = True
+    if retried and 'speculative' in st.session_state:
+        # Its stages hold the failed futures
+        st.session_state.pop('speculative').cancel()
+
+def wait_for(future, message):
+    """Result of a background-loaded resource, with a spinner only if it isn't ready"""
+    try:
+        if not future.done():
+            with st.spinner(message):
+                return future.result()
+        return future.result()
+    except Exception as e:
+        # retry_failed_loads starts the load again on the next run
+        st.error(f"The model could not be loaded ({e}). Please reload the page to try again.")
+        st.stop()
+
+def assess_responses(responses, bert_service):
+    """Combine threshold analysis with the BERT prediction into the final result"""
+    # BERT model analysis
+    with metrics.span("bert_inference"):
+        predictions = bert_service.classify(list(responses))
+    return combine_assessment(responses, predictions)
+
+def combine_assessment(responses, predictions):
+    """Final result from the threshold analysis and BERT's class probabilities"""
+    # Traditional threshold-based analysis
+    condition, scores = analyze_responses(responses)
     
-    # Define search terms for different conditions
-    search_terms = {
-        "Depression": ["depression self help", "depression coping strategies", "depression management techniques"],
-        "Anxiety": ["anxiety management", "anxiety coping techniques", "anxiety relief strategies"],
-        "Bipolar": ["bipolar disorder self management", "bipolar mood stability techniques", "living with bipolar"],
-        "Personality Disorders": ["DBT skills", "emotional regulation techniques", "borderline personality self help"],
-        "OCD and Thought Issues": ["OCD exposure response prevention", "intrusive thoughts management", "OCD self help"],
-        "Stress": ["stress management techniques", "work life balance", "stress reduction methods"],
-        "Suicidal": ["suicide prevention resources", "crisis management mental health", "suicide safety planning"],
-        "Normal": ["mental wellness tips", "emotional resilience building", "preventive mental health"]
-    }
+    predicted_class = torch.argmax(predictions, dim=1).item()
     
-    # Select the appropriate search terms
-    terms = search_terms.get(condition, search_terms["Normal"])
+    # Get model label mapping 
+    bert_prediction = class_names[predicted_class]
     
-    # Fallback resources in case API calls fail
-    fallback_resources = {
-        "Depression": [
-            {"title": "NIMH - Depression", "link": "https://www.nimh.nih.gov/health/topics/depression"},
-            {"title": "Mayo Clinic - Depression self-management", "link": "https://www.mayoclinic.org/diseases-conditions/depression/diagnosis-treatment/drc-20356013"},
-            {"title": "Healthline - Natural Depression Remedies", "link": "https://www.healthline.com/health/depression/natural-remedies"}
-        ],
-        "Anxiety": [
-            {"title": "NIMH - Anxiety Disorders", "link": "https://www.nimh.nih.gov/health/topics/anxiety-disorders"},
-            {"title": "Mayo Clinic - Anxiety management", "link": "https://www.mayoclinic.org/diseases-conditions/anxiety/diagnosis-treatment/drc-20350967"},
-            {"title": "Calm Clinic - Anxiety Techniques", "link": "https://www.calmclinic.com/anxiety/treatment/self-help"}
-        ],
-        "Bipolar": [
-            {"title": "NIMH - Bipolar Disorder", "link": "https://www.nimh.nih.gov/health/topics/bipolar-disorder"},
-            {"title": "Depression and Bipolar Support Alliance", "link": "https://www.dbsalliance.org/"},
-            {"title": "Healthline - Living with Bipolar Disorder", "link": "https://www.healthline.com/health/bipolar-disorder/living-with"}
-        ],
-        "Personality Disorders": [
-            {"title": "NAMI - Borderline Personality Disorder", "link": "https://www.nami.org/About-Mental-Illness/Mental-Health-Conditions/Borderline-Personality-Disorder"},
-            {"title": "NHS - Personality disorders", "link": "https://www.nhs.uk/mental-health/conditions/personality-disorders/"},
-            {"title": "Very Well Mind - DBT Skills", "link": "https://www.verywellmind.com/dialectical-behavior-therapy-dbt-for-bpd-425454"}
-        ],
-        "OCD and Thought Issues": [
-            {"title": "International OCD Foundation", "link": "https://iocdf.org/"},
-            {"title": "OCD-UK", "link": "https://www.ocduk.org/"},
-            {"title": "Very Well Mind - OCD Self-Help", "link": "https://www.verywellmind.com/ocd-self-help-2510625"}
-        ],
-        "Stress": [
-            {"title": "American Psychological Association ", "link": "https://www.apa.org/topics/stress"},
-            {"title": "Mayo Clinic - Stress management", "link": "https://www.mayoclinic.org/healthy-lifestyle/stress-management/basics/stress-basics/hlv-20049495"},
-            {"title": "HelpGuide - Stress Management", "link": "https://www.helpguide.org/articles/stress/stress-management.htm"}
-        ],
-        "Suicidal": [
-            {"title": "National Suicide Prevention Lifeline", "link": "https://988lifeline.org/"},
-            {"title": "Crisis Text Line", "link": "https://www.crisistextline.org/"},
-            {"title": "American Foundation for Suicide Prevention", "link": "https://afsp.org/"}
-        ],
-        "Normal": [
-            {"title": "Mental Health America - Staying Mentally Healthy", "link": "https://mhanational.org/staying-mentally-healthy"},
-            {"title": "Mayo Clinic - Mental health: Overcoming the stigma", "link": "https://www.mayoclinic.org/diseases-conditions/mental-illness/in-depth/mental-health/art-20046477"},
-            {"title": "Mind - How to improve mental wellbeing", "link": "https://www.mind.org.uk/information-support/tips-for-everyday-living/wellbeing/"}
-        ]
-    }
+    # Combined result (give preference to BERT model but consider threshold analysis)
+    final_result = bert_prediction
     
-    try:
-        # Use a medical/psychological API or search service here
-        # This is a placeholder for actual API integration
-        # You would implement calls to specific health advice APIs here
-        
-        # Simulate fetching strategies
-        strategies = []
-        resources = []
+    # If BERT says normal but thresholds indicate an issue, use threshold result
+    if bert_prediction == "Normal" and condition != "Normal":
+        final_result = condition
         
-        # For demonstration, use a sample API call to get mental health strategies
-        # In a real implementation, you would use a proper health API
-        for term in terms[:1]:  # Limit to one term to avoid rate limits
-            try:
-                # Example of how you might fetch data from a search API
-                # response = requests.get(f"https://api.example.com/health-search?q={term}")
-                # data = response.json()
-                
-                # Since we can't make actual API calls, use fallback data
-                strategies = [
-                    f"Establish a consistent daily routine with regular sleep patterns",
-                    f"Practice mindfulness meditation for 10-15 minutes daily",
-                    f"Engage in regular physical activity (30 minutes, 5 days a week)",
-                    f"Keep a mood journal to track triggers and patterns",
-                    f"Connect with supportive friends or family members regularly",
-                    f"Try cognitive behavioral techniques to challenge negative thoughts",
-                    f"Set realistic, achievable goals and celebrate small wins",
-                    f"Consider joining a support group (online or in-person)"
-                ]
-                
-                # Add some variety based on the condition
-                if condition == "Depression":
-                    strategies.append("Schedule pleasurable activities even when motivation is low")
-                    strategies.append("Limit alcohol and caffeine which can worsen mood")
-                elif condition == "Anxiety":
-                    strategies.append("Practice deep breathing exercises (4-7-8 technique)")
-                    strategies.append("Create a worry schedule to contain anxious thoughts")
-                elif condition == "Bipolar":
-                    strategies.append("Maintain a consistent sleep schedule even during mood shifts")
-                    strategies.append("Create a crisis plan for managing manic or depressive episodes")
-                
-                # Get resource links - in a real implementation, you'd fetch these from an API
-                resources = fallback_resources.get(condition, fallback_resources["Normal"])
-                
-            except Exception as e:
-                st.error(f"Error fetching recommendations: {str(e)}")
-                # Use fallback data
-                strategies = ["Error fetching specific strategies. Please check the resources below."]
-                resources = fallback_resources.get(condition, fallback_resources["Normal"])
-    
-    except Exception as e:
-        st.error(f"Error connecting to recommendation services: {str(e)}")
-        # Use fallback data
-        strategies = ["Unable to fetch online recommendations at this time."]
-        resources = fallback_resources.get(condition, fallback_resources["Normal"])
+    # Special case for suicidal - always prioritize this if threshold met
+    if scores["Suicidal"] >= thresholds["Suicidal"]:
+        final_result = "Suicidal"
     
     return {
-        "strategies": strategies,
-        "resources": resources
+        "condition": condition,
+        "scores": scores,
+        "bert_prediction": bert_prediction,
+        "final_result": final_result
     }
 
+def session_results(responses):
+    """Per-session results memo for the current answers, reset whenever they change"""
+    key = responses_key(responses)
+    cache = st.session_state.get("results_cache")
+    if cache is None or cache["key"] != key:
+        cache = {"key": key, "stages": {}}
+        st.session_state.results_cache = cache
+    return cache["stages"]
+
+def memoized_stage(stages, name, compute):
+    """Return a results stage from the session memo, computing it on a miss"""
+    stats = st.session_state.results_cache_stats
+    metrics.cache("session_results", hit=name in stages)
+    if name in stages:
+        stats["hits"] += 1
+        return stages[name]
+    stats["misses"] += 1
+    with metrics.span(name, parent="results_page"):
+        stages[name] = compute()
+    return stages[name]
+
+# Metrics export: Prometheus text file and/or a local /metrics endpoint (None to disable).
+# Workers forked by shared_serving.py write metrics.<worker>.prom and serve on
+# METRICS_PORT + <worker>
+METRICS_FILE = "metrics.prom"
+METRICS_PORT = None
+
+# Show the metrics debug panel on the results page (also enabled by ?debug=1)
+DEBUG_PANEL = False
+
+@st.cache_resource
+def start_metrics_exporters():
+    worker = model_loading.worker_index
+    if METRICS_FILE:
+        path = METRICS_FILE
+        if worker is not None:
+            root, ext = os.path.splitext(METRICS_FILE)
+            path = f"{root}.{worker}{ext}"
+        start_file_exporter(path)
+    if METRICS_PORT:
+        start_http_exporter(METRICS_PORT + (worker or 0))
+    return True
+
+def show_debug_panel(model_loader, bert_service_future):
+    """Expander with the current metrics, session cache counters and model stats"""
+    with st.expander("Debug: pipeline metrics"):
+        st.json({
+            "session_results_cache": st.session_state.results_cache_stats,
+            "model_loading": model_loader.timings(),
+            "bert_service": ("failed" if failed(bert_service_future) else
+                             bert_service_future.result().stats() if bert_service_future.done() else "loading"),
+        })
+        st.code(metrics.render_prometheus(), language="text")
+
+# Compute results in the background while the user is on the last section
+SPECULATIVE_INFERENCE = True
+
+@st.cache_resource
+def load_speculative_executor():
+    # Only runs speculative explanation generation; BERT requests go to the batching queue
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculative")
+
+def get_speculative_runner(bert_service, explanation_store):
+    """Per-session runner starting the assessment and explanation stages early
+
+    Takes the futures from load_inference_service and load_explanation_store,
+    so a job started before the models finish loading waits for them without
+    holding a thread (cancelling the job never cancels the loads).
+    """
+    if 'speculative' not in st.session_state:
+        def assessment(responses, results):
+            def classify(service):
+                # Batched together with every other session's requests
+                predictions = service.submit(list(responses))
+                return chain(predictions, lambda p: combine_assessment(responses, p))
+            return chain(bert_service, classify, cancel_source=False)
+
+        def explanation(responses, results):
+            condition = results["assessment"]["final_result"]
+            def explain(store):
+                if store.lookup(condition) is None and STREAM_EXPLANATIONS and store.can_stream():
+                    # Streamed on the results page instead
+                    return None
+                return load_speculative_executor().submit(store.get, condition)
+            return chain(explanation_store, explain, cancel_source=False)
+
+        st.session_state.speculative = SpeculativeRunner([("assessment", assessment), ("explanation", explanation)])
+    return st.session_state.speculative
+
+# Rendered radar charts kept in memory, one per distinct set of section scores
+RADAR_CHART_CACHE_SIZE = 256
+
+@st.cache_resource
+def load_radar_chart_cache():
+    return RadarChartCache(RADAR_CHART_CACHE_SIZE)
+
+def create_radar_chart(scores):
+    """Radar chart (PNG bytes) of section scores as a percentage of each section's maximum"""
+    return load_radar_chart_cache().get(scores)
+
+# Completed assessments are appended here for population-level reporting (None to disable)
+ASSESSMENT_STORE_PATH = "assessment_store"
+
+@st.cache_resource
+def load_assessment_store():
+    return AssessmentStore(ASSESSMENT_STORE_PATH) if ASSESSMENT_STORE_PATH else None
+
+# Search endpoint for live resource links ({"results": [{"title", "link"}]}); None uses the catalog only
+RESOURCE_SEARCH_URL = None
+RESOURCE_FETCH_TIMEOUT = 3.0
+
+@st.cache_resource
+def load_resource_fetcher():
+    return ResourceFetcher(RESOURCE_SEARCH_URL, timeout=RESOURCE_FETCH_TIMEOUT)
+
+def get_online_resources(condition):
+    """Fetch online resources and advice for the given condition"""
+    return load_resource_fetcher().get(condition)
+
 def main():
     st.title("Comprehensive Mental Health Assessment")
     
-    # Load models
-    bert_tokenizer, bert_model, chatbot = load_models()
+    # Start loading models; only the results page waits for them
+    model_loader = load_models()
+    retry_failed_loads(model_loader)
+    start_metrics_exporters()
+    bert_service_future = load_inference_service()
+    explanation_store_future = load_explanation_store()
     
     # Initialize session state for responses
     if 'responses' not in st.session_state:
@@ -253,6 +287,8 @@ def main():
         st.session_state.page = 0
     if 'submitted' not in st.session_state:
         st.session_state.submitted = False
+    if 'results_cache_stats' not in st.session_state:
+        st.session_state.results_cache_stats = {"hits": 0, "misses": 0, "speculative": 0}
     
     # Show instructions on first page
     if st.session_state.page == 0:
@@ -267,10 +303,13 @@ def main():
         - 2 = More than half the days
         - 3 = Nearly every day
         
-        Your responses are confidential and will be used to provide guidance only. 
+        Your responses are confidential. Completed assessments are stored anonymously 
+        (your answers, the results and the time, nothing that identifies you) for aggregate reporting. 
         This is not a diagnostic tool and does not replace professional evaluation.
         """)
         
+        model_loader.mark("first_page")
+        
         if st.button("Begin Assessment"):
             st.session_state.page = 1
             st.rerun()
@@ -292,10 +331,14 @@ def main():
             st.session_state.responses[i] = st.select_slider(
                 questions[i],
                 options=[0, 1, 2, 3],
-                format_func=lambda x: ["Not at all", "Several days", "More than half the days", "Nearly every day"][x],
+                format_func=lambda x: frequency_labels[x],
                 value=st.session_state.responses[i]
             )
         
+        # Start on the results while the last section is being answered
+        if SPECULATIVE_INFERENCE and st.session_state.page == 5:
+            get_speculative_runner(bert_service_future, explanation_store_future).update(st.session_state.responses)
+        
         # Navigation buttons
         col1, col2 = st.columns(2)
         
@@ -317,34 +360,38 @@ def main():
     # Results page
     elif st.session_state.page == 6:
         st.subheader("Assessment Results")
+        page_started = time.perf_counter()
         
-        with st.spinner("Analyzing responses..."):
-            # Traditional threshold-based analysis
-            condition, scores = analyze_responses(st.session_state.responses)
-            
-            # BERT model analysis
-            text_input = responses_to_text(st.session_state.responses)
-            inputs = bert_tokenizer(text_input, return_tensors="pt", truncation=True, padding=True, max_length=512)
-            
-            with torch.no_grad():
-                outputs = bert_model(**inputs)
-                predictions = torch.nn.functional.softmax(outputs.logits, dim=-1)
-                predicted_class = torch.argmax(predictions, dim=1).item()
-            
-            # Get model label mapping 
-            class_names = ["Normal", "Depression", "Anxiety", "Bipolar", "Personality Disorder", "Stress", "Suicidal"]
-            bert_prediction = class_names[predicted_class]
-            
-            # Combined result (give preference to BERT model but consider threshold analysis)
-            final_result = bert_prediction
-            
-            # If BERT says normal but thresholds indicate an issue, use threshold result
-            if bert_prediction == "Normal" and condition != "Normal":
-                final_result = condition
-                
-            # Special case for suicidal - always prioritize this if threshold met
-            if scores["Suicidal"] >= thresholds["Suicidal"]:
-                final_result = "Suicidal"
+        # Reruns with unchanged answers reuse every stage computed so far
+        stages = session_results(st.session_state.responses)
+        
+        # Use the speculative job if it ran on exactly these answers
+        if not stages and 'speculative' in st.session_state:
+            speculated = st.session_state.speculative.take(st.session_state.responses)
+            metrics.cache("speculative", hit=bool(speculated))
+            if speculated:
+                stages.update(speculated)
+                st.session_state.results_cache_stats["speculative"] += 1
+        
+        def analyze():
+            bert_service = wait_for(bert_service_future, "Loading the assessment model...")
+            with st.spinner("Analyzing responses..."):
+                return assess_responses(st.session_state.responses, bert_service)
+        
+        assessment = memoized_stage(stages, "assessment", analyze)
+        scores = assessment["scores"]
+        final_result = assessment["final_result"]
+        
+        # Keep each completed assessment once (restarting starts a new one)
+        if "recorded" not in stages:
+            try:
+                assessment_store = load_assessment_store()
+                if assessment_store is not None:
+                    assessment_store.record(st.session_state.responses, final_result, assessment["bert_prediction"])
+            except (OSError, ValueError):
+                # Reporting data is best effort, never block the results page
+                pass
+            stages["recorded"] = True
         
         # # Display results
         # st.markdown(f"## Primary Assessment: {final_result}")
@@ -352,14 +399,37 @@ def main():
         st.markdown(f"## Primary Assessment: <span style='color:{color};'>{final_result}</span>", unsafe_allow_html=True)
 
         
-        # Generate explanation using chatbot
-        explanation_prompt = f"Based on a mental health screening, someone showed signs of {final_result}. Provide a brief, supportive explanation of what this might mean and gentle advice on next steps. Be compassionate but not alarming."
+        st.markdown("### What This Means")
         
-        with st.spinner("Generating recommendations..."):
-            explanation = chatbot(explanation_prompt, max_length=300)[0]['generated_text']
+        # Generate explanation using chatbot (usually already cached)
+        streamed = False
+        def explain():
+            nonlocal streamed
+            explanation_store = wait_for(explanation_store_future, "Loading the explanation model...")
+            explanation = explanation_store.lookup(final_result)
+            if explanation is None and STREAM_EXPLANATIONS and explanation_store.can_stream():
+                # Restarting sets the event; a rerun interrupts write_stream and closes the stream
+                cancelled = st.session_state.explanation_cancelled = threading.Event()
+                stream = explanation_store.stream(final_result, cancelled)
+                placeholder = st.empty()
+                try:
+                    explanation = placeholder.write_stream(stream)
+                    streamed = True
+                except Exception:
+                    # Replace any partial text with the pipeline's explanation
+                    placeholder.empty()
+                    with st.spinner("Generating recommendations..."):
+                        explanation = explanation_store.get(final_result)
+                finally:
+                    stream.close()
+            elif explanation is None:
+                with st.spinner("Generating recommendations..."):
+                    explanation = explanation_store.get(final_result)
+            return explanation
         
-        st.markdown("### What This Means")
-        st.write(explanation)
+        explanation = memoized_stage(stages, "explanation", explain)
+        if not streamed:
+            st.write(explanation)
         
         # Show section scores
         st.markdown("### Assessment Breakdown")
@@ -376,7 +446,7 @@ def main():
             st.info("Connecting to health resources to provide personalized strategies...")
             
             # Get online recommendations
-            recommendations = get_online_resources(final_result)
+            recommendations = memoized_stage(stages, "recommendations", lambda: get_online_resources(final_result))
         
         # Create tabs for strategies and resources
         tabs = st.tabs(["Daily Practices", "Recommended Resources"])
@@ -403,44 +473,9 @@ def main():
         
         # Add visualization if needed
         if st.checkbox("Show detailed breakdown visualization"):
-            # Create radar chart for section scores
-            import matplotlib.pyplot as plt
-            import pandas as pd
-            
-            # Prepare data for radar chart
-            categories = list(sections.keys())
-            values = []
-            for category in categories:
-                if category in scores:
-                    # Normalize scores to percentages
-                    max_possible = len(sections[category]) * 3
-                    values.append((scores[category] / max_possible) * 100)
-                else:
-                    values.append(0)
-            
-            # Create the radar chart
-            fig = plt.figure(figsize=(10, 6))
-            ax = fig.add_subplot(111, polar=True)
-            
-            # Set the angles for each category
-            angles = np.linspace(0, 2*np.pi, len(categories), endpoint=False).tolist()
-            values.append(values[0])  # Close the loop
-            angles.append(angles[0])  # Close the loop
-            categories.append(categories[0])  # Close the loop
-            
-            # Plot the radar chart
-            ax.plot(angles, values)
-            ax.fill(angles, values, alpha=0.1)
-            
-            # Set the labels
-            ax.set_xticks(angles[:-1])
-            ax.set_xticklabels(categories[:-1])
-            
-            # Set y-axis limits
-            ax.set_ylim(0, 100)
-            
-            # Display the chart
-            st.pyplot(fig)
+            with metrics.span("radar_chart", parent="results_page"):
+                # Radar chart for section scores, rendered once per score vector
+                st.image(create_radar_chart(scores))
         
         # Important disclaimer
         st.markdown("""
@@ -451,11 +486,20 @@ def main():
         seek help from a healthcare provider.
         """)
         
+        metrics.observe("stage_latency_seconds", time.perf_counter() - page_started, stage="results_page", parent="")
+        if DEBUG_PANEL or st.query_params.get("debug") == "1":
+            show_debug_panel(model_loader, bert_service_future)
+        
         # Restart button
         if st.button("Restart Assessment"):
             st.session_state.responses = [0] * len(questions)
             st.session_state.page = 0
             st.session_state.submitted = False
+            st.session_state.pop("results_cache", None)
+            if 'speculative' in st.session_state:
+                st.session_state.speculative.cancel()
+            if 'explanation_cancelled' in st.session_state:
+                st.session_state.explanation_cancelled.set()
             st.rerun()
             
         # Resources section if high risk is detected
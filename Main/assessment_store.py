@@ -0,0 +1,477 @@
+"""Compact append-only store of completed assessments for population reporting
+
+Each record takes 16 bytes, spread over fixed-width columns:
+- one column per section holding its answers at 2 bits each (first question
+  in the lowest bits), 1 byte for up to 4 questions and 2 bytes for up to 8
+- final_result (a result_conditions code) and bert_prediction (a class_names code)
+- a uint32 Unix timestamp
+
+Columns are raw little-endian files in segment directories of at most
+segment_rows records, so they can be memory-mapped as-is. No personal data is
+kept, only the answers, the two results and the time.
+
+Aggregate queries read per-day summaries (result counts, section score
+histograms and answer counts) instead of the records. Full segments never
+change again, so their summary is computed once and saved next to them; the
+segment being appended to is summarized incrementally. Queries over tens of
+millions of records therefore only add up one summary row per day.
+
+Usage:
+    python assessment_store.py                                   # summary of assessment_store/
+    python assessment_store.py --benchmark 20000000 --path /tmp/assessments
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from questionnaire import questions, sections, class_names, result_conditions
+
+try:
+    import fcntl
+except ImportError:
+    # Without flock, appends are only serialized within one process
+    fcntl = None
+
+FORMAT_VERSION = 1
+DEFAULT_PATH = "assessment_store"
+
+section_names = list(sections)
+_section_questions = list(sections.values())
+
+COLUMNS = {f"section_{i}": "<u1" if len(indices) <= 4 else "<u2" for i, indices in enumerate(_section_questions)}
+COLUMNS.update({"final_result": "<u1", "bert_prediction": "<u1", "timestamp": "<u4"})
+RECORD_BYTES = sum(np.dtype(dtype).itemsize for dtype in COLUMNS.values())
+
+
+def _section_score_tables():
+    """Section score for every packed section value"""
+    tables = []
+    for indices in _section_questions:
+        values = np.arange(4 ** len(indices))
+        tables.append(sum((values >> (2 * bit)) & 3 for bit in range(len(indices))).astype(np.intp))
+    return tables
+
+
+_score_tables = _section_score_tables()
+
+
+def _summary_layout():
+    """Column slices of a summary row: result counts, section score histograms, answer counts"""
+    sizes = [("final_result", len(result_conditions)), ("bert_prediction", len(class_names))]
+    sizes += [(f"section_{i}", 3 * len(indices) + 1) for i, indices in enumerate(_section_questions)]
+    sizes += [("answers", 4 * len(questions))]
+    layout, position = {}, 0
+    for name, size in sizes:
+        layout[name] = slice(position, position + size)
+        position += size
+    return layout, position
+
+
+SUMMARY_LAYOUT, SUMMARY_WIDTH = _summary_layout()
+
+
+def pack_answers(answers):
+    """Section columns for an (n x 35) answer matrix"""
+    answers = np.minimum(np.asarray(answers, dtype=np.uint16).reshape(-1, len(questions)), 3)
+    packed = {}
+    for i, indices in enumerate(_section_questions):
+        value = np.zeros(len(answers), dtype=np.uint16)
+        for bit, question in enumerate(indices):
+            value |= answers[:, question] << (2 * bit)
+        packed[f"section_{i}"] = value.astype(COLUMNS[f"section_{i}"])
+    return packed
+
+
+def unpack_answers(columns):
+    """(n x 35) answer matrix from section columns"""
+    n = len(columns["timestamp"])
+    answers = np.empty((n, len(questions)), dtype=np.uint8)
+    for i, indices in enumerate(_section_questions):
+        packed = np.asarray(columns[f"section_{i}"])
+        for bit, question in enumerate(indices):
+            answers[:, question] = (packed >> (2 * bit)) & 3
+    return answers
+
+
+def summarize(columns, resolution):
+    """Per-time-bucket summary of records: (bucket start times, counts matrix)"""
+    timestamps = np.asarray(columns["timestamp"])
+    if len(timestamps) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, SUMMARY_WIDTH), dtype=np.int64)
+    buckets, inverse = np.unique(timestamps // resolution, return_inverse=True)
+    n_buckets = len(buckets)
+    counts = np.zeros((n_buckets, SUMMARY_WIDTH), dtype=np.int64)
+
+    def add(columns_slice, values, size):
+        counts[:, columns_slice] += np.bincount(inverse * size + values,
+                                                minlength=n_buckets * size).reshape(n_buckets, size)
+
+    add(SUMMARY_LAYOUT["final_result"], columns["final_result"], len(result_conditions))
+    add(SUMMARY_LAYOUT["bert_prediction"], columns["bert_prediction"], len(class_names))
+    answers = SUMMARY_LAYOUT["answers"].start
+    for i, indices in enumerate(_section_questions):
+        packed = np.asarray(columns[f"section_{i}"])
+        add(SUMMARY_LAYOUT[f"section_{i}"], _score_tables[i][packed], 3 * len(indices) + 1)
+        for bit, question in enumerate(indices):
+            add(slice(answers + 4 * question, answers + 4 * question + 4), (packed >> (2 * bit)) & 3, 4)
+    return buckets.astype(np.int64) * resolution, counts
+
+
+def _merge_summaries(summaries):
+    starts = np.concatenate([s for s, _ in summaries])
+    counts = np.concatenate([c for _, c in summaries])
+    unique_starts, inverse = np.unique(starts, return_inverse=True)
+    merged = np.zeros((len(unique_starts), SUMMARY_WIDTH), dtype=np.int64)
+    np.add.at(merged, inverse, counts)
+    return unique_starts, merged
+
+
+class AssessmentStore:
+    """Append completed assessments and query aggregates over them
+
+    resolution is the summary time bucket in seconds (a day by default);
+    query time bounds are rounded down to it and prevalence windows must be a
+    multiple of it.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, segment_rows=1 << 20, resolution=86400):
+        self.path = path
+        self.layout = {
+            "version": FORMAT_VERSION,
+            "columns": COLUMNS,
+            "sections": sections,
+            "conditions": result_conditions,
+            "bert_classes": class_names,
+            "resolution": resolution,
+        }
+        self._lock = threading.Lock()
+        self._summaries = {}
+        self._merged = None
+        self._condition_codes = {name: i for i, name in enumerate(result_conditions)}
+        self._class_codes = {name: i for i, name in enumerate(class_names)}
+
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if {key: meta.get(key) for key in self.layout} != json.loads(json.dumps(self.layout)):
+                raise ValueError(f"{path} was written with a different questionnaire or record layout")
+            self.segment_rows = meta["segment_rows"]
+        else:
+            self.segment_rows = segment_rows
+            tmp_path = f"{meta_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({**self.layout, "segment_rows": segment_rows}, f, indent=2)
+            os.replace(tmp_path, meta_path)
+        self.resolution = resolution
+
+    # Writing
+
+    def record(self, responses, final_result, bert_prediction, timestamp=None):
+        """Append one completed assessment"""
+        if final_result not in self._condition_codes or bert_prediction not in self._class_codes:
+            raise ValueError(f"Unknown result {final_result!r} / {bert_prediction!r}")
+        self.append([responses], [self._condition_codes[final_result]], [self._class_codes[bert_prediction]],
+                    [int(time.time()) if timestamp is None else timestamp])
+
+    def append(self, answers, final_codes, bert_codes, timestamps):
+        """Append many records; codes index result_conditions and class_names"""
+        columns = pack_answers(answers)
+        columns["final_result"] = np.asarray(final_codes, dtype=COLUMNS["final_result"])
+        columns["bert_prediction"] = np.asarray(bert_codes, dtype=COLUMNS["bert_prediction"])
+        columns["timestamp"] = np.asarray(timestamps, dtype=COLUMNS["timestamp"])
+        n = len(columns["timestamp"])
+        if any(len(values) != n for values in columns.values()):
+            raise ValueError("All record fields need the same length")
+
+        with self._lock, self._file_lock():
+            done = 0
+            while done < n:
+                segment, rows = self._active_segment()
+                take = min(n - done, self.segment_rows - rows)
+                # Column by column; readers only see rows present in every column
+                for name in COLUMNS:
+                    with open(os.path.join(segment, f"{name}.bin"), "ab") as f:
+                        f.write(columns[name][done:done + take].tobytes())
+                done += take
+
+    def _file_lock(self):
+        lock_path = os.path.join(self.path, ".lock")
+
+        class FileLock:
+            def __enter__(lock):
+                lock.file = open(lock_path, "a")
+                if fcntl is not None:
+                    fcntl.flock(lock.file, fcntl.LOCK_EX)
+
+            def __exit__(lock, *exc):
+                # Closing the file releases the flock
+                lock.file.close()
+
+        return FileLock()
+
+    def _active_segment(self):
+        """Segment to append to and its row count, dropping any half-written record"""
+        segments = self.segments()
+        if segments:
+            segment = segments[-1]
+            rows = self._segment_rows(segment)
+            for name, dtype in COLUMNS.items():
+                column_path = os.path.join(segment, f"{name}.bin")
+                if os.path.getsize(column_path) != rows * np.dtype(dtype).itemsize:
+                    os.truncate(column_path, rows * np.dtype(dtype).itemsize)
+            if rows < self.segment_rows:
+                return segment, rows
+        segment = os.path.join(self.path, f"segment_{len(segments):05d}")
+        os.makedirs(segment, exist_ok=True)
+        for name in COLUMNS:
+            open(os.path.join(segment, f"{name}.bin"), "ab").close()
+        return segment, 0
+
+    # Reading
+
+    def segments(self):
+        return sorted(os.path.join(self.path, name) for name in os.listdir(self.path)
+                      if name.startswith("segment_"))
+
+    def _segment_rows(self, segment):
+        rows = []
+        for name, dtype in COLUMNS.items():
+            try:
+                rows.append(os.path.getsize(os.path.join(segment, f"{name}.bin")) // np.dtype(dtype).itemsize)
+            except OSError:
+                rows.append(0)
+        return min(rows)
+
+    def segment_columns(self, segment, start_row=0):
+        """Memory-mapped columns of a segment from start_row on"""
+        rows = self._segment_rows(segment)
+        if rows <= start_row:
+            return {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        return {name: np.memmap(os.path.join(segment, f"{name}.bin"), dtype=dtype, mode="r", shape=(rows,))[start_row:]
+                for name, dtype in COLUMNS.items()}
+
+    def __len__(self):
+        return sum(self._segment_rows(segment) for segment in self.segments())
+
+    def summary(self):
+        """Per-bucket summary of all records: (bucket start times, counts matrix)"""
+        segments = [(segment, self._segment_rows(segment)) for segment in self.segments()]
+        merged = self._merged
+        if merged is not None and merged[0] == segments:
+            return merged[1], merged[2]
+
+        summaries = [self._segment_summary(segment) for segment, _ in segments]
+        summaries = [s for s in summaries if len(s[0])]
+        if summaries:
+            starts, counts = _merge_summaries(summaries)
+        else:
+            starts, counts = summarize({"timestamp": []}, self.resolution)
+        self._merged = (segments, starts, counts)
+        return starts, counts
+
+    def _segment_summary(self, segment):
+        rows = self._segment_rows(segment)
+        with self._lock:
+            cached = self._summaries.get(segment)
+        if cached is None and rows >= self.segment_rows:
+            cached = self._load_summary(segment, rows)
+        if cached is not None and cached[0] == rows:
+            return cached[1], cached[2]
+
+        # New rows since the cached summary (all rows the first time)
+        cached_rows = cached[0] if cached is not None else 0
+        new = summarize(self.segment_columns(segment, cached_rows), self.resolution)
+        starts, counts = _merge_summaries([cached[1:], new]) if cached_rows else new
+        with self._lock:
+            self._summaries[segment] = (rows, starts, counts)
+        if rows >= self.segment_rows:
+            self._save_summary(segment, rows, starts, counts)
+        return starts, counts
+
+    def _load_summary(self, segment, rows):
+        try:
+            with np.load(os.path.join(segment, "summary.npz")) as data:
+                if int(data["rows"]) == rows:
+                    return rows, data["starts"], data["counts"]
+        except (OSError, KeyError, ValueError):
+            pass
+        return None
+
+    def _save_summary(self, segment, rows, starts, counts):
+        # Several processes may summarize the same segment at once
+        tmp_path = os.path.join(segment, f"summary.{os.getpid()}-{threading.get_ident()}.tmp.npz")
+        try:
+            np.savez(tmp_path, rows=rows, starts=starts, counts=counts)
+            os.replace(tmp_path, os.path.join(segment, "summary.npz"))
+        except OSError:
+            # Recomputed next time the store is opened
+            pass
+
+    def _selected(self, start=None, end=None):
+        starts, counts = self.summary()
+        mask = np.ones(len(starts), dtype=bool)
+        if start is not None:
+            mask &= starts >= start // self.resolution * self.resolution
+        if end is not None:
+            mask &= starts < end // self.resolution * self.resolution
+        return starts[mask], counts[mask]
+
+    # Queries
+
+    def count(self, start=None, end=None):
+        _, counts = self._selected(start, end)
+        return int(counts[:, SUMMARY_LAYOUT["final_result"]].sum())
+
+    def prevalence(self, window=86400, start=None, end=None, field="final_result"):
+        """Result counts and shares per time window
+
+        field is "final_result" or "bert_prediction". Windows are aligned to
+        multiples of window since the epoch; empty windows are included.
+        """
+        if window % self.resolution:
+            raise ValueError(f"window must be a multiple of {self.resolution} seconds")
+        names = result_conditions if field == "final_result" else class_names
+        starts, counts = self._selected(start, end)
+        if not len(starts):
+            return {"window_start": np.zeros(0, dtype=np.int64), "conditions": names,
+                    "counts": np.zeros((0, len(names)), dtype=np.int64), "prevalence": np.zeros((0, len(names)))}
+        first = starts.min() // window * window
+        windows = (starts - first) // window
+        by_window = np.zeros((int(windows.max()) + 1, len(names)), dtype=np.int64)
+        np.add.at(by_window, windows, counts[:, SUMMARY_LAYOUT[field]])
+        totals = by_window.sum(axis=1, keepdims=True)
+        return {
+            "window_start": first + window * np.arange(len(by_window)),
+            "conditions": names,
+            "counts": by_window,
+            "prevalence": np.divide(by_window, totals, out=np.zeros(by_window.shape), where=totals > 0),
+        }
+
+    def section_score_distributions(self, start=None, end=None):
+        """{section: number of records with each score 0..max}"""
+        _, counts = self._selected(start, end)
+        totals = counts.sum(axis=0)
+        return {name: totals[SUMMARY_LAYOUT[f"section_{i}"]] for i, name in enumerate(section_names)}
+
+    def answer_counts(self, start=None, end=None):
+        """(35 x 4) number of records giving each answer to each question"""
+        _, counts = self._selected(start, end)
+        return counts[:, SUMMARY_LAYOUT["answers"]].sum(axis=0).reshape(len(questions), 4)
+
+    def question_means(self, start=None, end=None):
+        """Mean answer (0-3) to each question"""
+        answer_counts = self.answer_counts(start, end)
+        total = answer_counts[0].sum()
+        return answer_counts @ np.arange(4) / total if total else np.zeros(len(questions))
+
+
+def benchmark(path, n, days=365, chunk=1 << 20, seed=0, repeats=5):
+    """Fill an empty store with synthetic assessments, check the aggregates and time the queries"""
+    from batch_scoring import analyze_batch, condition_names, score_matrix, score_names
+    from synthetic import synthetic_answers
+
+    if os.path.exists(path) and os.listdir(path):
+        raise SystemExit(f"{path} is not empty; benchmark into a fresh directory")
+    store = AssessmentStore(path)
+    rng = np.random.default_rng(seed)
+    condition_codes = np.array([result_conditions.index(name) for name in condition_names])
+    end = int(time.time())
+    begin = end - days * 86400
+
+    expected_results = np.zeros(len(result_conditions), dtype=np.int64)
+    expected_answers = np.zeros((len(questions), 4), dtype=np.int64)
+    expected_sections = {name: np.zeros(3 * len(indices) + 1, dtype=np.int64) for name, indices in sections.items()}
+    write_seconds = 0.0
+    for k, offset in enumerate(range(0, n, chunk)):
+        size = min(chunk, n - offset)
+        answers = synthetic_answers(size, seed + k)
+        final = condition_codes[analyze_batch(answers)["screen"]]
+        bert = rng.integers(len(class_names), size=size)
+        # Records arrive in time order, as they do from the app
+        timestamps = begin + (offset + np.arange(size)) * (end - begin) // n
+
+        expected_results += np.bincount(final, minlength=len(result_conditions))
+        for q in range(len(questions)):
+            expected_answers[q] += np.bincount(answers[:, q], minlength=4)
+        scores = score_matrix(answers)
+        for name in sections:
+            expected_sections[name] += np.bincount(scores[:, score_names.index(name)], minlength=len(expected_sections[name]))
+
+        start = time.perf_counter()
+        store.append(answers, final, bert, timestamps)
+        write_seconds += time.perf_counter() - start
+
+    def timed(fn):
+        start = time.perf_counter()
+        fn()
+        first = time.perf_counter() - start
+        runs = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = fn()
+            runs.append(time.perf_counter() - start)
+        return result, {"first_ms": first * 1000, "median_ms": float(np.median(runs)) * 1000}
+
+    report = {"records": n, "record_bytes": RECORD_BYTES, "segments": len(store.segments()),
+              "write_records_per_s": n / write_seconds, "queries": {}}
+    # Summaries of full segments are built on first use and then read back from disk
+    for label, reopened in (("first_open", store), ("reopened", AssessmentStore(path))):
+        queries = {
+            "prevalence_daily": lambda: reopened.prevalence(86400),
+            "prevalence_weekly_last_90_days": lambda: reopened.prevalence(7 * 86400, start=end - 90 * 86400),
+            "section_score_distributions": reopened.section_score_distributions,
+            "question_means": reopened.question_means,
+        }
+        results = {}
+        for name, fn in queries.items():
+            results[name], report["queries"][f"{label}:{name}"] = timed(fn)
+
+    # Aggregates must match the records that went in
+    assert np.array_equal(results["prevalence_daily"]["counts"].sum(axis=0), expected_results)
+    assert np.array_equal(store.answer_counts(), expected_answers)
+    for name in sections:
+        assert np.array_equal(results["section_score_distributions"][name], expected_sections[name]), name
+    sample = store.segment_columns(store.segments()[0])
+    assert np.array_equal(unpack_answers({key: value[:1000] for key, value in sample.items()}),
+                          synthetic_answers(min(chunk, n), seed)[:1000])
+    report["verified"] = True
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assessment store aggregates and benchmark")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--benchmark", type=int, metavar="N",
+                        help="Fill an empty store at --path with N synthetic records and time the queries")
+    parser.add_argument("--days", type=int, default=365, help="Time span of the synthetic records")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print(json.dumps(benchmark(args.path, args.benchmark, args.days), indent=2))
+        return
+
+    store = AssessmentStore(args.path)
+    prevalence = store.prevalence(7 * 86400)
+    report = {
+        "records": store.count(),
+        "weekly_prevalence": [
+            {"week_start": time.strftime("%Y-%m-%d", time.gmtime(int(week))),
+             **{name: round(float(share), 4) for name, share in zip(prevalence["conditions"], shares)}}
+            for week, shares in zip(prevalence["window_start"], prevalence["prevalence"])
+        ],
+        "section_score_distributions": {name: counts.tolist()
+                                        for name, counts in store.section_score_distributions().items()},
+        "question_means": dict(zip(questions, np.round(store.question_means(), 3).tolist())),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""Vectorized threshold scoring for large batches of exported questionnaires
+
+Usage:
+    python batch_scoring.py answers.csv --output results.csv
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from questionnaire import questions, sections, thresholds, analyze_responses
+
+# Score columns, in the same order analyze_responses fills its scores dict
+score_names = list(sections.keys()) + ["Suicidal"]
+
+# Conditions that can win the threshold check, in thresholds order so that
+# ties resolve exactly like the stable sort in analyze_responses
+candidate_names = [c for c in thresholds if c in score_names]
+condition_names = candidate_names + ["Normal"]
+NORMAL = condition_names.index("Normal")
+SUICIDAL = condition_names.index("Suicidal")
+
+# Rows per matrix product, keeps the float32 working set around 10 MB
+CHUNK_ROWS = 65536
+
+
+def _membership_matrix():
+    """Build the (questions x score columns) 0/1 matrix used for the section sums"""
+    membership = np.zeros((len(questions), len(score_names)), dtype=np.float32)
+    for col, condition in enumerate(sections):
+        membership[sections[condition], col] = 1
+    membership[3, score_names.index("Suicidal")] = 1
+    return membership
+
+
+membership = _membership_matrix()
+candidate_cols = np.array([score_names.index(c) for c in candidate_names])
+candidate_thresholds = np.array([thresholds[c] for c in candidate_names], dtype=np.int16)
+
+
+def score_matrix(answers):
+    """Compute all score columns for an (N x 35) answer matrix"""
+    answers = np.asarray(answers)
+    if answers.ndim != 2 or answers.shape[1] != len(questions):
+        raise ValueError(f"Expected an (N x {len(questions)}) answer matrix, got shape {answers.shape}")
+
+    scores = np.empty((answers.shape[0], len(score_names)), dtype=np.uint8)
+    for start in range(0, answers.shape[0], CHUNK_ROWS):
+        chunk = answers[start:start + CHUNK_ROWS].astype(np.float32)
+        # Sums are small integers, so the float32 product is exact
+        scores[start:start + CHUNK_ROWS] = chunk @ membership
+    return scores
+
+
+def primary_conditions(scores):
+    """Vectorized equivalent of the threshold ranking in analyze_responses"""
+    candidates = scores[:, candidate_cols].astype(np.int16)
+    met = candidates >= candidate_thresholds
+
+    # argmax returns the first maximum, matching the stable sort on score
+    ranked = np.where(met, candidates, -1)
+    primary = ranked.argmax(axis=1).astype(np.uint8)
+    primary[~met.any(axis=1)] = NORMAL
+    return primary
+
+
+def analyze_batch(answers):
+    """Score an (N x 35) uint8 answer matrix in one pass
+
+    Returns a dict with the score columns, the primary threshold condition
+    (same as analyze_responses) and the screening result with the Suicidal
+    override applied, both as codes into condition_names.
+    """
+    answers = np.asarray(answers)
+    if answers.size and answers.max() > 3:
+        raise ValueError("Answers must be in the range 0-3")
+
+    scores = score_matrix(answers)
+    primary = primary_conditions(scores)
+
+    # Special case for suicidal - always prioritize this if threshold met
+    suicidal = scores[:, score_names.index("Suicidal")] >= thresholds["Suicidal"]
+    screen = np.where(suicidal, SUICIDAL, primary).astype(np.uint8)
+
+    return {
+        "scores": scores,
+        "primary": primary,
+        "screen": screen,
+    }
+
+
+def check_against_reference(answers):
+    """Return the row indices where analyze_batch disagrees with analyze_responses"""
+    result = analyze_batch(answers)
+    mismatches = []
+    for row, responses in enumerate(np.asarray(answers).tolist()):
+        condition, scores = analyze_responses(responses)
+        batch_scores = dict(zip(score_names, result["scores"][row].tolist()))
+        if condition != condition_names[result["primary"][row]] or scores != batch_scores:
+            mismatches.append(row)
+    return mismatches
+
+
+def load_answers_csv(path):
+    """Load a CSV of 0-3 answers into an (N x 35) uint8 matrix
+
+    Files holding only single digits 0-3, commas and line breaks are parsed
+    straight from the raw bytes; anything else falls back to np.loadtxt. A non-numeric first line is treated as a header.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    first_line, _, body = raw.partition(b"\n")
+    if any(ch.isalpha() for ch in first_line.decode("utf-8", "replace")):
+        raw = body
+        skiprows = 1
+    else:
+        skiprows = 0
+
+    buf = np.frombuffer(raw, dtype=np.uint8)
+    digits = buf[(buf >= ord("0")) & (buf <= ord("9"))]
+    separators = (buf == ord(",")) | (buf == ord("\r")) | (buf == ord("\n"))
+    n_rows = len([line for line in raw.splitlines() if line.strip()])
+    n_values = np.count_nonzero(buf == ord(",")) + n_rows
+
+    # Only digits between separators (no signs, spaces or decimals), all 0-3
+    if (n_rows and digits.size == buf.size - np.count_nonzero(separators)
+            and digits.size == n_values == n_rows * len(questions) and digits.max() <= ord("3")):
+        return (digits - ord("0")).reshape(n_rows, len(questions))
+
+    answers = np.loadtxt(path, delimiter=",", skiprows=skiprows, dtype=np.int64, ndmin=2)
+    if answers.size and (answers.min() < 0 or answers.max() > 3):
+        raise ValueError("Answers must be in the range 0-3")
+    return answers.astype(np.uint8)
+
+
+def write_results_csv(path, result):
+    """Write one line per questionnaire with score columns and conditions"""
+    names = np.array(condition_names)
+    primary = names[result["primary"]]
+    screen = names[result["screen"]]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(",".join(score_names + ["primary", "screen"]) + "\n")
+        for scores, p, s in zip(result["scores"].tolist(), primary.tolist(), screen.tolist()):
+            f.write(",".join(map(str, scores)) + f",{p},{s}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk threshold scoring of exported questionnaires")
+    parser.add_argument("input", help="CSV file with 35 answer columns (0-3) per row")
+    parser.add_argument("--output", help="Write per-row results to this CSV (or .npz) file")
+    parser.add_argument("--verify", action="store_true",
+                        help="Cross-check every row against analyze_responses (slow)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    answers = load_answers_csv(args.input)
+    loaded = time.perf_counter()
+    result = analyze_batch(answers)
+    scored = time.perf_counter()
+
+    print(f"Loaded {len(answers)} questionnaires in {loaded - start:.2f}s, scored in {scored - loaded:.3f}s")
+    counts = np.bincount(result["screen"], minlength=len(condition_names))
+    for name, count in zip(condition_names, counts):
+        print(f"  {name}: {count} ({count / max(len(answers), 1) * 100:.1f}%)")
+
+    if args.verify:
+        mismatches = check_against_reference(answers)
+        print(f"Reference check: {len(mismatches)} mismatching rows")
+
+    if args.output:
+        if args.output.endswith(".npz"):
+            np.savez(args.output, condition_names=np.array(condition_names), score_names=np.array(score_names), **result)
+        else:
+            write_results_csv(args.output, result)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""Reproducible benchmark of every stage of the assessment pipeline
+
+Times each stage on seeded synthetic answers and writes p50/p95/p99 latency,
+throughput and memory as JSON so runs can be compared. --tiny swaps in small
+randomly initialised stand-ins for BERT and blenderbot, so the suite runs
+without downloading the real weights (only the non-model numbers are then
+comparable with a real run).
+
+Usage:
+    python benchmark.py --tiny --output bench_tiny.json
+    python benchmark.py --output bench.json --iterations 50
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import re
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import torch
+
+from model_loading import BERT_MODEL_PATH, CHATBOT_MODEL, load_bert, load_chatbot
+from questionnaire import questions, frequency_labels, analyze_responses, responses_to_text
+from synthetic import synthetic_answers
+from token_table import TokenTable
+
+
+def tiny_models(seed=0):
+    """Small random BERT classifier, its tokenizer and a blenderbot-style chatbot"""
+    from transformers import (BertConfig, BertForSequenceClassification, BertTokenizerFast,
+                              BlenderbotConfig, BlenderbotForConditionalGeneration, pipeline)
+    from questionnaire import class_names
+    from explanations import explanation_prompt, result_conditions
+
+    torch.manual_seed(seed)
+    texts = questions + frequency_labels + [explanation_prompt(c) for c in result_conditions]
+    words = sorted({word for text in texts for word in re.findall(r"\w+|[^\w\s]", text.lower())})
+    with tempfile.TemporaryDirectory() as tmp:
+        vocab_path = os.path.join(tmp, "vocab.txt")
+        with open(vocab_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words) + "\n")
+        tokenizer = BertTokenizerFast(vocab_file=vocab_path)
+
+    bert_model = BertForSequenceClassification(BertConfig(
+        vocab_size=tokenizer.vocab_size, hidden_size=64, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=128, num_labels=len(class_names),
+    )).eval()
+    chat_model = BlenderbotForConditionalGeneration(BlenderbotConfig(
+        vocab_size=tokenizer.vocab_size, d_model=64, encoder_layers=1, decoder_layers=1,
+        encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=128, decoder_ffn_dim=128,
+        max_position_embeddings=512, pad_token_id=tokenizer.pad_token_id,
+        bos_token_id=tokenizer.cls_token_id, decoder_start_token_id=tokenizer.cls_token_id,
+        # Never emitted by a random model, so generation always runs to max_length
+        eos_token_id=tokenizer.mask_token_id,
+    )).eval()
+    chatbot = pipeline("text2text-generation", model=chat_model, tokenizer=tokenizer)
+    return tokenizer, bert_model, chatbot
+
+
+def process_memory_mb(field):
+    """VmRSS (current) or VmHWM (peak) of this process, from /proc/self/status"""
+    with open("/proc/self/status", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def reset_peak_rss():
+    """Reset this process's peak RSS to its current RSS (Linux clear_refs)"""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="utf-8") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def time_stage(fn, iterations, warmup=3, items_per_call=1):
+    """Run fn(i) repeatedly and summarise latency, throughput and memory
+
+    Memory is the stage's own peak RSS: the process peak is reset before the
+    timed runs, so earlier (bigger) stages don't show up in later ones. This
+    includes torch tensor memory, which tracemalloc doesn't see.
+    """
+    for i in range(warmup):
+        fn(i)
+
+    gc.collect()
+    rss_before = process_memory_mb("VmRSS")
+    peak_reset = reset_peak_rss()
+    latencies = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        latencies[i] = time.perf_counter() - start
+    stage_peak = process_memory_mb("VmHWM") if peak_reset else None
+    gc.collect()
+    rss_after = process_memory_mb("VmRSS")
+
+    # Separate short pass for Python allocations, tracemalloc slows everything down
+    tracemalloc.start()
+    for i in range(min(iterations, 5)):
+        fn(i)
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "mean_ms": float(latencies.mean() * 1000),
+        "throughput_per_s": float(iterations * items_per_call / latencies.sum()),
+        "python_peak_kb": python_peak / 1024,
+        "rss_before_mb": rss_before,
+        # None where the peak can't be reset (non-Linux, restricted /proc)
+        "stage_peak_rss_mb": stage_peak,
+        "stage_peak_rss_growth_mb": stage_peak - rss_before if stage_peak is not None else None,
+        "rss_retained_mb": rss_after - rss_before,
+    }
+
+
+def time_streaming(chatbot, prompts, iterations, max_length=300):
+    """Time to first token and total time of streamed chatbot generations
+
+    Decodes greedily like the app's streaming mode, streamers don't support
+    beam search.
+    """
+    from explanations import stream_generation
+
+    first_token = np.empty(iterations)
+    total = np.empty(iterations)
+    for i in range(iterations + 1):
+        start = time.perf_counter()
+        first = None
+        for _ in stream_generation(chatbot, prompts[i % len(prompts)], max_length=max_length, num_beams=1):
+            if first is None:
+                first = time.perf_counter() - start
+        # The first run is warmup
+        if i:
+            first_token[i - 1] = first
+            total[i - 1] = time.perf_counter() - start
+    return {
+        "iterations": iterations,
+        "num_beams": 1,
+        "first_token_p50_ms": float(np.percentile(first_token, 50) * 1000),
+        "first_token_p95_ms": float(np.percentile(first_token, 95) * 1000),
+        "total_p50_ms": float(np.percentile(total, 50) * 1000),
+        "total_p95_ms": float(np.percentile(total, 95) * 1000),
+    }
+
+
+def run_benchmarks(tokenizer, bert_model, chatbot, iterations=100, seed=0, batch_sizes=(1, 8, 32),
+                   generation_iterations=5, stages=None):
+    """Benchmark each pipeline stage, returns {stage: stats}"""
+    from app import get_online_resources
+    from explanations import explanation_prompt, result_conditions
+    from radar_chart import render_radar_chart
+
+    torch.manual_seed(seed)
+    answers = synthetic_answers(max(iterations, max(batch_sizes)) * 4, seed).tolist()
+    texts = [responses_to_text(responses) for responses in answers]
+    token_table = TokenTable(tokenizer, max_length=512)
+
+    def pick(i):
+        return answers[i % len(answers)]
+
+    def bert_forward(batch_size):
+        batch = [pick(i) for i in range(batch_size)]
+        inputs = tokenizer([responses_to_text(r) for r in batch], return_tensors="pt",
+                           truncation=True, padding=True, max_length=512)
+
+        def run(i):
+            with torch.no_grad():
+                torch.nn.functional.softmax(bert_model(**inputs).logits, dim=-1)
+        return run
+
+    def radar(i):
+        condition, scores = analyze_responses(pick(i))
+        render_radar_chart(scores)
+
+    plan = {
+        "analyze_responses": (lambda i: analyze_responses(pick(i)), iterations, 1),
+        "responses_to_text": (lambda i: responses_to_text(pick(i)), iterations, 1),
+        "tokenization": (lambda i: tokenizer(texts[i % len(texts)], return_tensors="pt", truncation=True,
+                                             padding=True, max_length=512), iterations, 1),
+        "token_table_encode": (lambda i: token_table.encode_batch([pick(i)]), iterations, 1),
+    }
+    for batch_size in batch_sizes:
+        plan[f"bert_forward_batch_{batch_size}"] = (bert_forward(batch_size), max(iterations // batch_size, 5), batch_size)
+    plan.update({
+        "chatbot_generation": (lambda i: chatbot(explanation_prompt(result_conditions[i % len(result_conditions)]),
+                                                 max_length=300), generation_iterations, 1),
+        "get_online_resources": (lambda i: get_online_resources(result_conditions[i % len(result_conditions)]),
+                                 iterations, 1),
+        "radar_chart": (radar, max(iterations // 5, 5), 1),
+    })
+
+    results = {}
+    for name, (fn, n, items) in plan.items():
+        if stages and name not in stages:
+            continue
+        results[name] = time_stage(fn, n, warmup=1 if name == "chatbot_generation" else 3, items_per_call=items)
+    if not stages or "chatbot_streaming" in stages:
+        prompts = [explanation_prompt(condition) for condition in result_conditions]
+        results["chatbot_streaming"] = time_streaming(chatbot, prompts, generation_iterations)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the assessment pipeline")
+    parser.add_argument("--tiny", action="store_true", help="Use small random stand-in models")
+    parser.add_argument("--bert-path", default=BERT_MODEL_PATH)
+    parser.add_argument("--chatbot-model", default=CHATBOT_MODEL)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--generation-iterations", type=int, default=5)
+    parser.add_argument("--batch-sizes", default="1,8,32", help="Comma-separated BERT batch sizes")
+    parser.add_argument("--stages", help="Comma-separated subset of stages to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threads", type=int, help="torch intra-op threads")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    import matplotlib
+    matplotlib.use("Agg")
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    if args.tiny:
+        tokenizer, bert_model, chatbot = tiny_models(args.seed)
+    else:
+        tokenizer, bert_model = load_bert(args.bert_path)
+        chatbot = load_chatbot(args.chatbot_model)
+
+    results = run_benchmarks(
+        tokenizer, bert_model, chatbot,
+        iterations=args.iterations,
+        seed=args.seed,
+        batch_sizes=[int(size) for size in args.batch_sizes.split(",")],
+        generation_iterations=args.generation_iterations,
+        stages=args.stages.split(",") if args.stages else None,
+    )
+    report = {
+        "models": "tiny" if args.tiny else {"bert": args.bert_path, "chatbot": args.chatbot_model},
+        "seed": args.seed,
+        "environment": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "torch_threads": torch.get_num_threads(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "stages": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Sequence length, latency and quality of the BERT input encodings
+
+For every mode in questionnaire.encoding_modes this reports token lengths
+(and how often max_length=512 truncation cuts off the end of the
+questionnaire), forward-pass latency, and classification quality. Quality is
+accuracy when a labelled answers CSV is given (35 answer columns followed by a
+status column using class_names), otherwise agreement with the "full" mode.
+
+Predictions are compared as status names, mapped through each classifier's own
+output order: the notebook's statement classifier (the app's default model)
+follows its LabelEncoder (label_encoder.pkl, sorted statuses without it),
+while classifiers retrained in notebook Step 7.3 follow class_names.
+
+Each compact mode should be paired with a classifier retrained on it:
+    python encoding_benchmark.py --model full=mental_health_bert_model --label-encoder full=label_encoder.pkl \
+        --model keys=mental_health_bert_model_keys --labelled labelled_answers.csv
+"""
+
+import argparse
+import csv
+import json
+import pickle
+import time
+
+import numpy as np
+import torch
+
+from model_loading import BERT_MODEL_PATH, load_bert
+from questionnaire import questions, class_names, encoding_modes, encode_responses
+from synthetic import synthetic_answers
+
+
+def load_labelled_answers(path):
+    """Answers and statuses (lowercased) from a CSV of 35 answer columns plus status"""
+    answers, labels = [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader)
+        for row in reader:
+            answers.append([int(value) for value in row[:len(questions)]])
+            labels.append(row[len(questions)].strip().lower())
+    return np.array(answers, dtype=np.uint8), np.array(labels)
+
+
+def model_classes(path, label_encoder_path=None):
+    """Lowercased status names in the order of a classifier's outputs"""
+    if label_encoder_path:
+        with open(label_encoder_path, "rb") as f:
+            classes = [str(c) for c in pickle.load(f).classes_]
+    elif path == BERT_MODEL_PATH:
+        # The notebook's LabelEncoder sorts the statuses
+        classes = sorted(class_names)
+    else:
+        classes = class_names
+    return np.array([c.strip().lower() for c in classes])
+
+
+def benchmark_mode(mode, answers, tokenizer, model, max_length=512, latency_samples=50):
+    texts = [encode_responses(responses, mode) for responses in answers.tolist()]
+    lengths = np.array([len(ids) for ids in tokenizer(texts, truncation=False)["input_ids"]])
+
+    predictions, latencies = [], []
+    with torch.no_grad():
+        for i, text in enumerate(texts):
+            inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=max_length)
+            start = time.perf_counter()
+            logits = model(**inputs).logits
+            if i < latency_samples:
+                latencies.append(time.perf_counter() - start)
+            predictions.append(int(torch.argmax(logits, dim=1)))
+
+    latencies = np.array(latencies)
+    return np.array(predictions), {
+        "tokens_mean": float(lengths.mean()),
+        "tokens_p95": float(np.percentile(lengths, 95)),
+        "tokens_max": int(lengths.max()),
+        "truncated_fraction": float((lengths > max_length).mean()),
+        "latency_ms_p50": float(np.percentile(latencies, 50) * 1000),
+        "latency_ms_p95": float(np.percentile(latencies, 95) * 1000),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare BERT input encodings")
+    parser.add_argument("--model", action="append", default=[], metavar="MODE=PATH",
+                        help="Classifier to use for an encoding mode (default: the app's model for all)")
+    parser.add_argument("--label-encoder", action="append", default=[], metavar="MODE=PATH",
+                        help="label_encoder.pkl giving that mode's classifier output order "
+                             "(default: sorted for the app's model, class_names for retrained ones)")
+    parser.add_argument("--bert-path", default=BERT_MODEL_PATH)
+    parser.add_argument("--labelled", help="CSV of 35 answer columns plus a status column")
+    parser.add_argument("--samples", type=int, default=500, help="Synthetic answer vectors when no labels are given")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    model_paths = dict(item.split("=", 1) for item in args.model)
+    label_encoders = dict(item.split("=", 1) for item in args.label_encoder)
+    if args.labelled:
+        answers, labels = load_labelled_answers(args.labelled)
+    else:
+        answers, labels = synthetic_answers(args.samples, args.seed), None
+
+    loaded = {}
+    predictions = {}
+    report = {"samples": len(answers), "modes": {}}
+    for mode in encoding_modes:
+        path = model_paths.get(mode, args.bert_path)
+        if path not in loaded:
+            loaded[path] = load_bert(path)
+        tokenizer, model = loaded[path]
+        predicted, report["modes"][mode] = benchmark_mode(mode, answers, tokenizer, model)
+        predictions[mode] = model_classes(path, label_encoders.get(mode))[predicted]
+        report["modes"][mode]["model"] = path
+
+    for mode, stats in report["modes"].items():
+        if labels is not None:
+            stats["accuracy"] = float((predictions[mode] == labels).mean())
+        else:
+            stats["agreement_with_full"] = float((predictions[mode] == predictions["full"]).mean())
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
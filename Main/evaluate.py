@@ -0,0 +1,194 @@
+"""Parallel offline evaluation of the BERT classifier over a statement corpus
+
+The corpus is split into shards that a process pool works through. Each
+worker loads the model once, runs with a fixed number of torch intra-op
+threads (so workers don't oversubscribe the cores) and streams its batched
+predictions to disk. Per-shard confusion matrices are merged into per-class
+metrics.
+
+The classifier's outputs follow the notebook's LabelEncoder, i.e. the sorted
+dataset statuses (or label_encoder.pkl's classes_ when given), not the order
+of class_names; class_names only supplies the names shown in reports.
+
+Usage:
+    python evaluate.py main_statement_status.csv --workers 4 --threads-per-worker 1 --output eval_results
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from model_loading import BERT_MODEL_PATH
+from questionnaire import class_names
+
+# Per-process state set up by _init_worker
+_worker = {}
+
+
+def label_classes(statuses, label_encoder_path=None):
+    """Statuses in the classifier's output order, the way the notebook's LabelEncoder has them"""
+    if label_encoder_path:
+        with open(label_encoder_path, "rb") as f:
+            return [str(c) for c in pickle.load(f).classes_]
+    # LabelEncoder sorts the classes
+    return sorted(set(str(status) for status in statuses))
+
+
+def display_names(classes):
+    """class_names spelling of each class (matched case-insensitively) for reports"""
+    names = {name.lower(): name for name in class_names}
+    return [names.get(c.strip().lower(), c) for c in classes]
+
+
+def map_statuses(statuses, classes):
+    """Class indices for dataset statuses in classes order (-1 if unknown)"""
+    index = {c: i for i, c in enumerate(classes)}
+    return np.array([index.get(str(status), -1) for status in statuses])
+
+
+def _init_worker(bert_path, threads, max_length, batch_size):
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    torch.set_num_threads(threads)
+    _worker["torch"] = torch
+    _worker["tokenizer"] = AutoTokenizer.from_pretrained(bert_path)
+    _worker["model"] = AutoModelForSequenceClassification.from_pretrained(bert_path).eval()
+    _worker["max_length"] = max_length
+    _worker["batch_size"] = batch_size
+
+
+def evaluate_shard(shard_id, start, statements, labels, output_dir, names):
+    """Predict one shard, stream rows to disk, return its confusion matrix"""
+    torch = _worker["torch"]
+    tokenizer, model = _worker["tokenizer"], _worker["model"]
+    batch_size = _worker["batch_size"]
+
+    confusion = np.zeros((len(names), len(names)), dtype=np.int64)
+    # Similar lengths in a batch keep padding small
+    order = np.argsort([len(s) for s in statements], kind="stable")
+    path = os.path.join(output_dir, f"predictions_{shard_id:05d}.csv")
+    begin = time.perf_counter()
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["row", "label", "predicted"] + [f"p_{name}" for name in names])
+        for i in range(0, len(order), batch_size):
+            batch = order[i:i + batch_size]
+            inputs = tokenizer([statements[j] for j in batch], return_tensors="pt", truncation=True,
+                               padding=True, max_length=_worker["max_length"])
+            with torch.no_grad():
+                probabilities = torch.nn.functional.softmax(model(**inputs).logits, dim=-1).numpy()
+            predicted = probabilities.argmax(axis=1)
+            for j, pred, probs in zip(batch, predicted, probabilities):
+                label = labels[j]
+                if label >= 0:
+                    confusion[label, pred] += 1
+                writer.writerow([start + j, label, pred] + [f"{p:.5f}" for p in probs])
+            f.flush()
+    return {"shard": shard_id, "samples": len(statements), "seconds": time.perf_counter() - begin,
+            "confusion": confusion}
+
+
+def per_class_metrics(confusion, names):
+    """Precision, recall, F1 and support for each class, keyed by name"""
+    report = {}
+    for i, name in enumerate(names):
+        tp = confusion[i, i]
+        predicted = confusion[:, i].sum()
+        support = confusion[i, :].sum()
+        precision = tp / predicted if predicted else 0.0
+        recall = tp / support if support else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        report[name] = {"precision": float(precision), "recall": float(recall), "f1": float(f1),
+                        "support": int(support)}
+    return report
+
+
+def run_evaluation(statements, labels, names, output_dir, bert_path=BERT_MODEL_PATH, workers=None,
+                   threads_per_worker=1, batch_size=32, max_length=128, shards_per_worker=4):
+    """Evaluate labels (indices into names, in the classifier's output order)"""
+    workers = workers or os.cpu_count()
+    os.makedirs(output_dir, exist_ok=True)
+    n_shards = max(1, min(len(statements), workers * shards_per_worker))
+    bounds = np.linspace(0, len(statements), n_shards + 1).astype(int)
+
+    confusion = np.zeros((len(names), len(names)), dtype=np.int64)
+    begin = time.perf_counter()
+    # spawn: workers start clean instead of inheriting the parent's torch thread pools
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(bert_path, threads_per_worker, max_length, batch_size)) as pool:
+        futures = [pool.submit(evaluate_shard, k, int(lo), statements[lo:hi], labels[lo:hi], output_dir, names)
+                   for k, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:]))]
+        shard_seconds = []
+        for future in as_completed(futures):
+            result = future.result()
+            confusion += result["confusion"]
+            shard_seconds.append(result["seconds"])
+    elapsed = time.perf_counter() - begin
+
+    labelled = int(confusion.sum())
+    report = {
+        "samples": len(statements),
+        "labelled_samples": labelled,
+        "accuracy": float(np.trace(confusion) / labelled) if labelled else None,
+        "per_class": per_class_metrics(confusion, names),
+        "confusion_matrix": {"labels": names, "rows_true_cols_predicted": confusion.tolist()},
+        "workers": workers,
+        "threads_per_worker": threads_per_worker,
+        "shards": n_shards,
+        "seconds": elapsed,
+        "samples_per_second": len(statements) / elapsed,
+        "mean_shard_seconds": float(np.mean(shard_seconds)),
+    }
+    with open(os.path.join(output_dir, "metrics.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    with open(os.path.join(output_dir, "confusion_matrix.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["true \\ predicted"] + names)
+        for name, row in zip(names, confusion.tolist()):
+            writer.writerow([name] + row)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded multi-process evaluation of the BERT classifier")
+    parser.add_argument("dataset", help="CSV with statement and status columns")
+    parser.add_argument("--bert-path", default=BERT_MODEL_PATH)
+    parser.add_argument("--output", default="eval_results", help="Directory for predictions and metrics")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-length", type=int, default=128, help="Tokenizer max_length (notebook trains with 128)")
+    parser.add_argument("--limit", type=int, help="Only evaluate the first N statements")
+    parser.add_argument("--label-encoder", help="label_encoder.pkl saved by the notebook (default: sorted statuses)")
+    args = parser.parse_args()
+
+    from training_data import load_statement_dataset
+
+    df = load_statement_dataset(args.dataset)
+    # Classes come from the whole dataset, as in training, even with --limit
+    classes = label_classes(df["status"], args.label_encoder)
+    if args.limit:
+        df = df.head(args.limit)
+    statements = df["statement"].tolist()
+    labels = map_statuses(df["status"], classes)
+    if (labels < 0).any():
+        unknown = sorted(set(df["status"].astype(str)[labels < 0]))
+        print(f"Statuses not in the label encoder's classes are excluded from metrics: {unknown}")
+
+    report = run_evaluation(statements, labels, display_names(classes), args.output, args.bert_path, args.workers,
+                            args.threads_per_worker, args.batch_size, args.max_length)
+    print(json.dumps({key: report[key] for key in ("samples", "accuracy", "workers", "seconds",
+                                                   "samples_per_second")}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
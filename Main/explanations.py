@@ -0,0 +1,236 @@
+"""Persistent cache of chatbot explanations for each assessment result
+
+The explanation prompt depends only on the final result, so each result's
+explanation is generated once per model and generation settings, saved to
+disk and reused across sessions, reruns and restarts. Explanations that aren't
+cached yet can be streamed token by token while they are generated, as long
+as decoding is greedy or sampled (streamers don't support beam search).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import torch
+import transformers
+
+from metrics import metrics
+from questionnaire import result_conditions
+
+DEFAULT_CACHE_PATH = "explanation_cache.json"
+
+
+def explanation_prompt(condition):
+    """Prompt sent to the chatbot for a given assessment result"""
+    return f"Based on a mental health screening, someone showed signs of {condition}. Provide a brief, supportive explanation of what this might mean and gentle advice on next steps. Be compassionate but not alarming."
+
+
+def model_fingerprint(chatbot):
+    """Identify the chatbot weights so cached text is dropped when the model changes"""
+    config = chatbot.model.config
+    return {
+        "model": config.name_or_path,
+        "revision": getattr(config, "_commit_hash", None),
+        "transformers": transformers.__version__,
+    }
+
+
+class _StopOnEvent(transformers.StoppingCriteria):
+    """Stop generation once any of the events is set"""
+
+    def __init__(self, *events):
+        self.events = [event for event in events if event is not None]
+
+    def __call__(self, input_ids, scores, **kwargs):
+        stop = any(event.is_set() for event in self.events)
+        return torch.full((input_ids.shape[0],), stop, dtype=torch.bool, device=input_ids.device)
+
+
+def stream_generation(chatbot, prompt, cancelled=None, **generation_kwargs):
+    """Yield the chatbot's reply to prompt as text chunks while it is generated
+
+    Generation runs in a background thread and stops early when cancelled (a
+    threading.Event) is set or the caller stops iterating. Time to first token
+    and total generation time are recorded as stage latencies.
+    """
+    tokenizer, model = chatbot.tokenizer, chatbot.model
+    streamer = transformers.TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    encoded = tokenizer(prompt, return_tensors="pt")
+    inputs = {"input_ids": encoded["input_ids"], "attention_mask": encoded["attention_mask"]}
+    stopped = threading.Event()
+    errors = []
+
+    def run():
+        try:
+            with torch.no_grad():
+                model.generate(**inputs, streamer=streamer,
+                               stopping_criteria=transformers.StoppingCriteriaList([_StopOnEvent(cancelled, stopped)]),
+                               **generation_kwargs)
+        except Exception as e:
+            errors.append(e)
+            streamer.end()
+
+    parent = metrics.current_span()
+    metrics.count("model_calls_total", model="chatbot")
+    start = time.perf_counter()
+    first_token = None
+    thread = threading.Thread(target=run, name="explanation-stream", daemon=True)
+    thread.start()
+    try:
+        for text in streamer:
+            if not text:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter() - start
+                metrics.observe("stage_latency_seconds", first_token, stage="chatbot_first_token", parent=parent)
+            yield text
+        if errors:
+            raise errors[0]
+        metrics.observe("stage_latency_seconds", time.perf_counter() - start, stage="chatbot_generation", parent=parent)
+    finally:
+        stopped.set()
+        thread.join()
+
+
+class ExplanationStore:
+    """Explanations keyed on prompt, model fingerprint and generation settings"""
+
+    def __init__(self, chatbot, path=DEFAULT_CACHE_PATH, **generation_kwargs):
+        self.chatbot = chatbot
+        self.path = path
+        self.generation_kwargs = generation_kwargs or {"max_length": 300}
+        self.fingerprint = model_fingerprint(chatbot)
+
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._entries = self._load()
+        self._prewarm_thread = None
+
+    def key(self, condition):
+        payload = {
+            "prompt": explanation_prompt(condition),
+            "model": self.fingerprint,
+            "generation": self.generation_kwargs,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def can_stream(self):
+        """Whether generation can be streamed, i.e. the settings don't use beam search
+
+        Streaming runs the same generate() settings as the pipeline, so a
+        streamed explanation is the one get() would have cached.
+        """
+        num_beams = self.generation_kwargs.get("num_beams", self.chatbot.model.generation_config.num_beams)
+        return (num_beams or 1) == 1
+
+    def lookup(self, condition):
+        """Cached explanation for condition, or None if it hasn't been generated yet"""
+        with self._lock:
+            return self._entries.get(self.key(condition))
+
+    def get(self, condition):
+        """Cached explanation for condition, generating and persisting it if needed"""
+        key = self.key(condition)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Only one thread generates a given explanation, the rest wait for it
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    metrics.cache("explanations", hit=True)
+                    return self._entries[key]
+            metrics.cache("explanations", hit=False)
+            explanation = self.generate(condition)
+            with self._lock:
+                self._entries[key] = explanation
+                self._save()
+            return explanation
+
+    def stream(self, condition, cancelled=None):
+        """Yield the explanation for condition as text chunks
+
+        A cached explanation comes back as a single chunk, and so does one
+        generated with beam search (see can_stream). Otherwise tokens are
+        yielded as they are generated, and the explanation is cached once it is
+        complete; cancelling (setting cancelled, or closing the generator)
+        stops generation and caches nothing. Generation errors are raised.
+        """
+        if not self.can_stream():
+            yield self.get(condition)
+            return
+
+        key = self.key(condition)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        if not key_lock.acquire(blocking=False):
+            # Already being generated (e.g. by prewarm), wait for that instead
+            yield self.get(condition)
+            return
+
+        try:
+            with self._lock:
+                explanation = self._entries.get(key)
+            metrics.cache("explanations", hit=explanation is not None)
+            if explanation is not None:
+                yield explanation
+                return
+
+            cancelled = cancelled or threading.Event()
+            chunks = []
+            for text in stream_generation(self.chatbot, explanation_prompt(condition), cancelled,
+                                          **self.generation_kwargs):
+                chunks.append(text)
+                yield text
+            if not cancelled.is_set():
+                with self._lock:
+                    self._entries[key] = "".join(chunks).strip()
+                    self._save()
+        finally:
+            key_lock.release()
+
+    def generate(self, condition):
+        metrics.count("model_calls_total", model="chatbot")
+        with metrics.span("chatbot_generation"):
+            return self.chatbot(explanation_prompt(condition), **self.generation_kwargs)[0]['generated_text']
+
+    def prewarm(self, conditions=None):
+        """Generate any missing explanations in a background thread"""
+        conditions = list(conditions or result_conditions)
+
+        def run():
+            for condition in conditions:
+                try:
+                    self.get(condition)
+                except Exception:
+                    # Leave it uncached; the results page will retry on demand
+                    pass
+
+        self._prewarm_thread = threading.Thread(target=run, name="explanation-prewarm", daemon=True)
+        self._prewarm_thread.start()
+        return self._prewarm_thread
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Entries from another model version are invalid, start over
+        if data.get("model") != self.fingerprint:
+            return {}
+        return dict(data.get("entries", {}))
+
+    def _save(self):
+        data = {"model": self.fingerprint, "entries": self._entries}
+        # Forked serving workers share the cache file, not the temp file
+        tmp_path = f"{self.path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # The in-memory cache still works if the disk isn't writable
+            pass
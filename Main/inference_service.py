@@ -0,0 +1,123 @@
+"""In-process dynamic batching for the BERT classifier
+
+All Streamlit sessions share one worker thread. Requests that arrive while a
+forward pass is running are queued and run together as the next micro-batch,
+so a lone user never waits for a batch to fill up while concurrent users share
+forward passes instead of competing for the same CPU cores.
+"""
+
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import torch
+
+from metrics import metrics, BATCH_SIZE_BUCKETS
+
+class BatchingClassifier:
+    """Queue classification requests and run them in micro-batches
+
+    encode turns a list of queued items into the model's input tensors, so the
+    service works both with raw text and with pre-tokenized answer vectors.
+    max_batch_size caps how many requests share one forward pass. max_wait_ms
+    is how long the worker keeps collecting after the first request of a batch;
+    the default of 0 only picks up requests that are already queued.
+    """
+
+    def __init__(self, model, encode, max_batch_size=16, max_wait_ms=0):
+        self.model = model
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._requests = 0
+        self._busy_seconds = 0.0
+
+        self._worker = threading.Thread(target=self._run, name="bert-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, item):
+        """Queue one input, returns a Future resolving to its softmax probabilities"""
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def classify(self, item, timeout=None):
+        """Classify one input and block until its probabilities are ready"""
+        return self.submit(item).result(timeout=timeout)
+
+    def stats(self):
+        """Queue depth and batch-size statistics since startup"""
+        with self._lock:
+            batches = sum(self._batch_sizes.values())
+            return {
+                "queue_depth": self._queue.qsize(),
+                "requests": self._requests,
+                "batches": batches,
+                "mean_batch_size": self._requests / batches if batches else 0.0,
+                "batch_sizes": dict(sorted(self._batch_sizes.items())),
+                "busy_seconds": self._busy_seconds,
+            }
+
+    def _collect_batch(self):
+        batch = []
+        while not batch:
+            self._claim(batch, self._queue.get())
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    self._claim(batch, self._queue.get(timeout=remaining))
+                else:
+                    self._claim(batch, self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _claim(batch, entry):
+        # Requests whose future was cancelled while queued are dropped
+        if entry[1].set_running_or_notify_cancel():
+            batch.append(entry)
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                self._process(batch)
+            except Exception as e:
+                # Keep the worker alive; fail whatever this batch left unresolved
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _process(self, batch):
+        items = [item for item, _ in batch]
+        futures = [future for _, future in batch]
+
+        start = time.perf_counter()
+        metrics.count("model_calls_total", model="bert")
+        metrics.observe("model_batch_size", len(batch), buckets=BATCH_SIZE_BUCKETS, model="bert")
+        try:
+            with metrics.span("bert_batch"):
+                inputs = self.encode(items)
+                with torch.no_grad():
+                    outputs = self.model(**inputs)
+                    predictions = torch.nn.functional.softmax(outputs.logits, dim=-1)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+        else:
+            for i, future in enumerate(futures):
+                future.set_result(predictions[i:i + 1])
+
+        with self._lock:
+            self._batch_sizes[len(batch)] += 1
+            self._requests += len(batch)
+            self._busy_seconds += time.perf_counter() - start
@@ -0,0 +1,182 @@
+"""Lightweight tracing and Prometheus-style metrics for the results pipeline
+
+Spans time a pipeline stage (nested spans record their parent), counters track
+model calls and cache hits/misses. Everything is kept in-process in a single
+registry and rendered in the Prometheus text exposition format, either to a
+file or over a local HTTP endpoint. Recording is a lock, a perf_counter call
+and a bisect, cheap enough to leave on all the time.
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "mh_"
+
+# Seconds; covers token-table encoding up to a cold blenderbot generation
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+DESCRIPTIONS = {
+    "stage_latency_seconds": "Latency of a results pipeline stage",
+    "model_calls_total": "Forward passes or generations per model",
+    "model_batch_size": "Requests per model call",
+    "cache_requests_total": "Cache lookups by cache and result (hit or miss)",
+    "stage_errors_total": "Pipeline stages that raised an exception",
+}
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Metrics:
+    """Thread-safe registry of counters and fixed-bucket histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._local = threading.local()
+
+    def count(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets),
+                                                     "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(buckets, value)
+            if index < len(buckets):
+                histogram["counts"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def cache(self, cache, hit):
+        """Record a cache lookup"""
+        self.count("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+    @contextmanager
+    def span(self, stage, parent=None):
+        """Time a pipeline stage; spans opened inside it are recorded with it as parent
+
+        parent can be given explicitly for stages of a page that isn't itself
+        wrapped in a span.
+        """
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        if parent is None:
+            parent = stack[-1] if stack else ""
+        stack.append(stage)
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            # Not BaseException: Streamlit's rerun and st.stop() signals aren't stage errors
+            self.count("stage_errors_total", stage=stage)
+            raise
+        finally:
+            self.observe("stage_latency_seconds", time.perf_counter() - start, stage=stage, parent=parent)
+            stack.pop()
+
+    def current_span(self):
+        """Stage of the innermost open span in this thread (empty if none)"""
+        stack = getattr(self._local, "stack", None)
+        return stack[-1] if stack else ""
+
+    def snapshot(self):
+        """Copy of all counters and histograms"""
+        with self._lock:
+            return dict(self._counters), {key: {**h, "counts": list(h["counts"])}
+                                          for key, h in self._histograms.items()}
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        counters, histograms = self.snapshot()
+        histogram_names = {name for name, _ in histograms}
+        lines = []
+        for name in sorted({name for name, _ in counters} | histogram_names):
+            kind = "histogram" if name in histogram_names else "counter"
+            help_text = DESCRIPTIONS.get(name, name)
+            lines.append(f"# HELP {PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+            for (metric, key), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{PREFIX}{name}{_format_labels(key)} {value}")
+            for (metric, key), h in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(h["buckets"], h["counts"]):
+                    cumulative += count
+                    lines.append(f"{PREFIX}{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"{PREFIX}{name}_bucket{_format_labels(key, [('le', '+Inf')])} {h['count']}")
+                lines.append(f"{PREFIX}{name}_sum{_format_labels(key)} {h['sum']}")
+                lines.append(f"{PREFIX}{name}_count{_format_labels(key)} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Atomically write the current metrics to a file (e.g. for node_exporter's textfile collector)"""
+        # Per process and thread, so workers writing to one directory don't collide
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+
+# Process-wide registry used by the app and its services
+metrics = Metrics()
+
+
+def start_file_exporter(path, interval=15, registry=metrics):
+    """Rewrite the metrics file every interval seconds in a daemon thread"""
+    def run():
+        while True:
+            try:
+                registry.write_prometheus(path)
+            except OSError:
+                pass
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="metrics-file-exporter", daemon=True)
+    thread.start()
+    return thread
+
+
+def start_http_exporter(port, host="127.0.0.1", registry=metrics):
+    """Serve /metrics on a local port in a daemon thread"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http-exporter", daemon=True).start()
+    return server
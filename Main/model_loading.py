@@ -0,0 +1,160 @@
+"""Background, parallel model loading with startup timing
+
+Both models start loading on worker threads as soon as the app starts, so the
+instructions page renders immediately and the results page only waits for the
+model it needs. Loads that fail can be started again with retry_failed().
+
+Usage (compare startup cost of the two strategies):
+    python model_loading.py --sequential
+    python model_loading.py
+"""
+
+import argparse
+import json
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BERT_MODEL_PATH = "mental_health_bert_model"
+CHATBOT_MODEL = "facebook/blenderbot-400M-distill"
+
+# Models loaded by a parent process before forking app workers (see
+# shared_serving.py), keyed like ModelLoader's requests
+preloaded = {}
+
+# Index of this app worker when forked by shared_serving.py, None otherwise
+worker_index = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def quantize_int8(model):
+    """Dynamic int8 quantization of the Linear layers for CPU inference"""
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_bert(path=BERT_MODEL_PATH, quantize=False):
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    bert_tokenizer = AutoTokenizer.from_pretrained(path)
+    bert_model = AutoModelForSequenceClassification.from_pretrained(path)
+    if quantize:
+        bert_model = quantize_int8(bert_model)
+    return bert_tokenizer, bert_model
+
+
+def load_chatbot(model=CHATBOT_MODEL):
+    from transformers import pipeline
+
+    return pipeline("text2text-generation", model=model)
+
+
+class ModelLoader:
+    """Load the BERT classifier and the chatbot in parallel in the background
+
+    quantize_bert selects int8 dynamic quantization of the classifier; see
+    quant_parity.py for how it compares with fp32.
+    """
+
+    def __init__(self, bert_path=BERT_MODEL_PATH, chatbot_model=CHATBOT_MODEL, parallel=True, quantize_bert=False):
+        self.started = time.perf_counter()
+        self._events = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="model-loader")
+
+        loaders = {
+            "bert": (("bert", bert_path, quantize_bert), lambda: load_bert(bert_path, quantize=quantize_bert)),
+            "chatbot": (("chatbot", chatbot_model), lambda: load_chatbot(chatbot_model)),
+        }
+        self._loaders = {}
+        self._futures = {}
+        previous = None
+        for name, (key, load) in loaders.items():
+            if key in preloaded:
+                # Shared copy-on-write weights from the serving parent process
+                load = lambda key=key: preloaded[key]
+            self._loaders[name] = load
+            if not parallel and previous is not None and key not in preloaded:
+                # Sequential mode: wait for the previous model first
+                load = self._chain(previous, load)
+            self._futures[name] = self._executor.submit(self._timed, name, load)
+            previous = self._futures[name]
+
+    def _chain(self, previous, load):
+        def run():
+            previous.result()
+            return load()
+        return run
+
+    def _timed(self, name, load):
+        start = time.perf_counter()
+        result = load()
+        self.mark(f"{name}_loaded", load_seconds=time.perf_counter() - start)
+        return result
+
+    def retry_failed(self):
+        """Start loads that raised again, returns the names of the restarted models"""
+        restarted = []
+        with self._lock:
+            for name, future in self._futures.items():
+                if future.done() and future.exception() is not None:
+                    self._futures[name] = self._executor.submit(self._timed, name, self._loaders[name])
+                    restarted.append(name)
+        return restarted
+
+    def future(self, name):
+        """Future resolving to the loaded model ("bert" or "chatbot")"""
+        return self._futures[name]
+
+    def get(self, name, timeout=None):
+        """Block until the given model is loaded and return it"""
+        return self._futures[name].result(timeout=timeout)
+
+    def after(self, name, fn):
+        """Future resolving to fn(model) once the given model has loaded"""
+        return self._executor.submit(lambda: fn(self.get(name)))
+
+    def mark(self, event, **extra):
+        """Record a startup event (first occurrence only) with elapsed time and peak RSS"""
+        with self._lock:
+            if event not in self._events:
+                self._events[event] = {
+                    "seconds": time.perf_counter() - self.started,
+                    "peak_rss_mb": peak_rss_mb(),
+                    **extra,
+                }
+
+    def timings(self):
+        """Startup events recorded so far"""
+        with self._lock:
+            return {event: dict(info) for event, info in self._events.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure model startup time and peak memory")
+    parser.add_argument("--bert-path", default=BERT_MODEL_PATH)
+    parser.add_argument("--chatbot-model", default=CHATBOT_MODEL)
+    parser.add_argument("--sequential", action="store_true", help="Load the models one after the other")
+    parser.add_argument("--int8", action="store_true", help="Quantize the BERT classifier to int8")
+    args = parser.parse_args()
+
+    loader = ModelLoader(args.bert_path, args.chatbot_model, parallel=not args.sequential, quantize_bert=args.int8)
+    if args.sequential:
+        # The old load_models() blocked the first page on both models
+        loader.get("chatbot")
+    loader.mark("first_page")
+    loader.get("bert")
+    loader.get("chatbot")
+    loader.mark("all_loaded")
+    print(json.dumps({"mode": "sequential" if args.sequential else "parallel", **loader.timings()}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
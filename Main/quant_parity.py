@@ -0,0 +1,131 @@
+"""Compare fp32 and int8 inference of the BERT classifier side by side
+
+Runs both variants over a labelled statement CSV (same "statement" and
+"status" columns the notebook trains on) and reports class agreement,
+accuracy, latency and model size as JSON.
+
+Usage:
+    python quant_parity.py main_statement_status.csv --limit 2000
+"""
+
+import argparse
+import copy
+import csv
+import io
+import json
+import pickle
+import time
+
+import numpy as np
+import torch
+
+from model_loading import BERT_MODEL_PATH, load_bert, peak_rss_mb, quantize_int8
+
+
+def load_statements(path, limit=None):
+    """Read (statement, status) pairs from the labelled CSV"""
+    statements, statuses = [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            statements.append(row["statement"] or "")
+            statuses.append(row["status"])
+            if limit and len(statements) >= limit:
+                break
+    return statements, statuses
+
+
+def encode_labels(statuses, label_encoder_path=None):
+    """Map status strings to class indices the way the notebook's LabelEncoder does"""
+    if label_encoder_path:
+        with open(label_encoder_path, "rb") as f:
+            classes = list(pickle.load(f).classes_)
+    else:
+        # LabelEncoder sorts the classes
+        classes = sorted(set(statuses))
+    index = {name: i for i, name in enumerate(classes)}
+    return np.array([index.get(status, -1) for status in statuses]), classes
+
+
+def model_size_mb(model):
+    """Serialized state_dict size, counts packed int8 weights correctly"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 1024 / 1024
+
+
+def predict(model, tokenizer, statements, batch_size, max_length):
+    """Predicted classes and per-batch latencies"""
+    predictions, latencies = [], []
+    with torch.no_grad():
+        for start in range(0, len(statements), batch_size):
+            inputs = tokenizer(statements[start:start + batch_size], return_tensors="pt",
+                               truncation=True, padding=True, max_length=max_length)
+            begin = time.perf_counter()
+            logits = model(**inputs).logits
+            latencies.append(time.perf_counter() - begin)
+            predictions.append(torch.argmax(logits, dim=1).numpy())
+    return np.concatenate(predictions), np.array(latencies)
+
+
+def summarize(predictions, labels, latencies, batch_size, size_mb):
+    labelled = labels >= 0
+    return {
+        "accuracy": float((predictions[labelled] == labels[labelled]).mean()) if labelled.any() else None,
+        "latency_ms_p50": float(np.percentile(latencies, 50) * 1000),
+        "latency_ms_p95": float(np.percentile(latencies, 95) * 1000),
+        "samples_per_second": float(len(predictions) / latencies.sum()),
+        "batch_size": batch_size,
+        "model_size_mb": size_mb,
+    }
+
+
+def run_parity(statements, labels, bert_path=BERT_MODEL_PATH, batch_size=8, max_length=128):
+    tokenizer, fp32_model = load_bert(bert_path)
+    fp32_model.eval()
+    int8_model = quantize_int8(copy.deepcopy(fp32_model))
+
+    rss_before = peak_rss_mb()
+    fp32_pred, fp32_lat = predict(fp32_model, tokenizer, statements, batch_size, max_length)
+    int8_pred, int8_lat = predict(int8_model, tokenizer, statements, batch_size, max_length)
+
+    fp32 = summarize(fp32_pred, labels, fp32_lat, batch_size, model_size_mb(fp32_model))
+    int8 = summarize(int8_pred, labels, int8_lat, batch_size, model_size_mb(int8_model))
+    return {
+        "samples": len(statements),
+        "class_agreement": float((fp32_pred == int8_pred).mean()),
+        "accuracy_change": (int8["accuracy"] - fp32["accuracy"]) if fp32["accuracy"] is not None else None,
+        "speedup": fp32_lat.sum() / int8_lat.sum(),
+        "peak_rss_mb": max(rss_before, peak_rss_mb()),
+        "fp32": fp32,
+        "int8": int8,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fp32 vs int8 parity check for the BERT classifier")
+    parser.add_argument("dataset", help="CSV with statement and status columns")
+    parser.add_argument("--bert-path", default=BERT_MODEL_PATH)
+    parser.add_argument("--label-encoder", help="label_encoder.pkl saved by the notebook")
+    parser.add_argument("--limit", type=int, help="Only use the first N statements")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-length", type=int, default=128, help="Tokenizer max_length (notebook trains with 128)")
+    parser.add_argument("--threads", type=int, help="torch intra-op threads")
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    statements, statuses = load_statements(args.dataset, args.limit)
+    labels, _ = encode_labels(statuses, args.label_encoder)
+    report = run_parity(statements, labels, args.bert_path, args.batch_size, args.max_length)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""Questionnaire definition and threshold scoring shared by the app and offline tools"""
+
+import hashlib
+
+# Define questionnaire
+questions = [
+    # Section A: Mood and Energy
+    "I feel sad, empty, or hopeless",
+    "I have little interest or pleasure in doing things",
+    "I feel guilty or that I'm a failure",
+    "I have thoughts that I would be better off dead or of hurting myself",
+    "I feel unusually high, energetic, or euphoric (extremely happy)",
+    "I need less sleep than usual but still don't feel tired",
+    "My thoughts race and I can't slow my mind down",
+    "I'm more talkative than usual or feel pressure to keep talking",
+    
+    # Section B: Anxiety and Stress
+    "I feel nervous, anxious, or on edge",
+    "I can't stop or control worrying",
+    "I have difficulty relaxing",
+    "I feel afraid as if something awful might happen",
+    "I feel overwhelmed by my responsibilities",
+    "I have physical symptoms like racing heart, sweating, or shortness of breath",
+    "I avoid situations or places that make me anxious",
+    
+    # Section C: Behavioral Patterns
+    "My mood changes dramatically and unpredictably",
+    "I engage in impulsive behaviors I later regret (spending money, risky sex, substance use)",
+    "I have intense and unstable relationships with others",
+    "I have difficulty controlling my anger",
+    "I feel disconnected from myself or my surroundings",
+    "I experience extreme reactions to perceived abandonment",
+    "I feel empty inside much of the time",
+    
+    # Section D: Thought Patterns
+    "I have recurring unwanted thoughts that cause anxiety",
+    "I engage in repetitive behaviors to reduce anxiety",
+    "I'm suspicious of others' intentions toward me",
+    "I have unusual beliefs or experiences others don't share",
+    "I have difficulty concentrating or making decisions",
+    "I'm excessively concerned with order, details, or rules",
+    "I'm preoccupied with my appearance or perceived flaws",
+    
+    # Section E: Social and Functional Impact
+    "I withdraw from social activities",
+    "I have difficulty performing at work or school",
+    "I have trouble maintaining personal relationships",
+    "I neglect my self-care or household responsibilities",
+    "I use alcohol or drugs to cope with my feelings",
+    "I have changes in my appetite or weight"
+]
+
+# Section indices
+sections = {
+    "Depression": [0, 1, 2, 3],
+    "Bipolar": [4, 5, 6, 7],
+    "Anxiety": [8, 9, 10, 11, 12, 13, 14],
+    "Personality Disorders": [15, 16, 17, 18, 19, 20, 21],
+    "OCD and Thought Issues": [22, 23, 24, 25, 26, 27, 28],
+    "Functional Impact": [29, 30, 31, 32, 33, 34]
+}
+
+# Thresholds for each condition
+thresholds = {
+    "Depression": 6,  # Out of 12 (4 questions, max 3 each)
+    "Suicidal": 2,    # Question 4 alone, if ≥ 2
+    "Bipolar": 8,     # Out of 12 (4 questions, max 3 each)
+    "Anxiety": 10,    # Out of 21 (7 questions, max 3 each)
+    "Personality Disorders": 10,  # Out of 21 (7 questions, max 3 each)
+    "OCD": 6,         # Questions 22-23, if sum ≥ 6
+    "Normal": float('inf')  # Default if others aren't met
+}
+
+# Answer labels for the 0-3 rating scale
+frequency_labels = ["Not at all", "Several days", "More than half the days", "Nearly every day"]
+
+# Abbreviated question keys and labels for the compact input encodings
+question_keys = [
+    # Section A: Mood and Energy
+    "sad", "no interest", "guilt", "self harm thoughts",
+    "euphoric", "less sleep", "racing thoughts", "pressured speech",
+    # Section B: Anxiety and Stress
+    "anxious", "uncontrolled worry", "cannot relax", "dread",
+    "overwhelmed", "panic symptoms", "avoidance",
+    # Section C: Behavioral Patterns
+    "mood swings", "impulsive", "unstable relationships", "anger",
+    "detached", "abandonment fear", "empty",
+    # Section D: Thought Patterns
+    "intrusive thoughts", "compulsions", "suspicious", "unusual beliefs",
+    "poor concentration", "perfectionism", "appearance concern",
+    # Section E: Social and Functional Impact
+    "withdrawn", "work trouble", "relationship trouble", "self neglect",
+    "substance use", "appetite change"
+]
+short_frequency_labels = ["never", "some days", "most days", "daily"]
+
+# Ways of turning answers into BERT input text, from longest to shortest
+encoding_modes = ["full", "nonzero", "keys", "sections"]
+
+# BERT classifier label mapping
+class_names = ["Normal", "Depression", "Anxiety", "Bipolar", "Personality Disorder", "Stress", "Suicidal"]
+
+# Every value final_result can take on the results page
+result_conditions = list(dict.fromkeys(
+    class_names + [c for c in thresholds if c in sections or c == "Suicidal"] + ["Normal"]
+))
+
+def analyze_responses(responses):
+    scores = {}
+    
+    # Calculate section scores
+    for condition, indices in sections.items():
+        scores[condition] = sum(responses[i] for i in indices)
+    
+    # Special case for suicidal ideation (question index 3)
+    scores["Suicidal"] = responses[3]
+    
+    # Determine conditions meeting thresholds
+    potential_conditions = []
+    for condition, threshold in thresholds.items():
+        if condition in scores and scores[condition] >= threshold:
+            potential_conditions.append((condition, scores[condition]))
+    
+    # If no conditions meet thresholds, consider "Normal"
+    if not potential_conditions:
+        return "Normal", scores
+    
+    # Sort by score (highest first)
+    potential_conditions.sort(key=lambda x: x[1], reverse=True)
+    
+    # Return the condition with highest score
+    primary_condition = potential_conditions[0][0]
+    
+    return primary_condition, scores
+
+def responses_to_text(responses):
+    """Convert numerical responses to text for BERT model"""
+    text_responses = [f"{questions[i]}: {frequency_labels[min(r, 3)]}" for i, r in enumerate(responses)]
+    return " ".join(text_responses)
+
+def response_segment(index, answer, mode="full"):
+    """Text for one answered question, or "" when the encoding leaves it out"""
+    answer = min(answer, 3)
+    if mode == "full":
+        return f"{questions[index]}: {frequency_labels[answer]}"
+    if mode not in ("nonzero", "keys"):
+        raise ValueError(f"No per-question segments for encoding mode {mode!r}")
+    # Compact encodings drop "Not at all" answers
+    if answer == 0:
+        return ""
+    if mode == "nonzero":
+        return f"{questions[index]}: {frequency_labels[answer]}"
+    return f"{question_keys[index]}: {short_frequency_labels[answer]}"
+
+def encode_responses(responses, mode="full"):
+    """Convert numerical responses to BERT input text using one of encoding_modes
+
+    "full" is responses_to_text. "nonzero" leaves out "Not at all" answers,
+    "keys" also abbreviates questions and labels, and "sections" only gives
+    each section's score plus the self-harm item.
+    """
+    if mode == "sections":
+        summaries = [f"{section} {sum(responses[i] for i in indices)} of {len(indices) * 3}"
+                     for section, indices in sections.items()]
+        summaries.append(f"self harm thoughts {short_frequency_labels[min(responses[3], 3)]}")
+        return ", ".join(summaries)
+    segments = (response_segment(i, r, mode) for i, r in enumerate(responses))
+    return " ".join(segment for segment in segments if segment)
+
+def responses_key(responses):
+    """Stable hash of an answer vector, used to key cached results"""
+    return hashlib.sha256(bytes(responses)).hexdigest()
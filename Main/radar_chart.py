@@ -0,0 +1,143 @@
+"""Radar chart of section scores, rendered once per score vector
+
+Charts are drawn with matplotlib's object API on an Agg canvas, so figures
+never enter pyplot's global figure registry, and each one is cleared as soon
+as its PNG is written. The PNG bytes are kept in a bounded LRU keyed on the
+section scores; matplotlib is only imported when a chart is actually drawn.
+
+Usage:
+    python radar_chart.py --soak 2000    # RSS stays flat over thousands of renders
+"""
+
+import argparse
+import gc
+import io
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import metrics
+from questionnaire import sections
+
+
+def section_percentages(scores):
+    """Each section's score as a percentage of its maximum, in sections order"""
+    return [scores[category] / (len(sections[category]) * 3) * 100 if category in scores else 0
+            for category in sections]
+
+
+def render_radar_chart(scores, dpi=100):
+    """PNG bytes of the radar chart for scores"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    categories = list(sections.keys())
+    values = section_percentages(scores)
+    angles = np.linspace(0, 2*np.pi, len(categories), endpoint=False).tolist()
+    # Close the loop
+    values.append(values[0])
+    angles.append(angles[0])
+
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    try:
+        ax = fig.add_subplot(111, polar=True)
+        ax.plot(angles, values)
+        ax.fill(angles, values, alpha=0.1)
+        ax.set_xticks(angles[:-1])
+        ax.set_xticklabels(categories)
+        ax.set_ylim(0, 100)
+
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+class RadarChartCache:
+    """Bounded LRU of rendered charts keyed on the section scores"""
+
+    def __init__(self, maxsize=256, dpi=100):
+        self.maxsize = maxsize
+        self.dpi = dpi
+        self._lock = threading.Lock()
+        self._charts = OrderedDict()
+
+    def get(self, scores):
+        key = tuple(scores.get(category) for category in sections)
+        with self._lock:
+            png = self._charts.get(key)
+            if png is not None:
+                self._charts.move_to_end(key)
+        metrics.cache("radar_chart", hit=png is not None)
+        if png is not None:
+            return png
+
+        png = render_radar_chart(scores, self.dpi)
+        with self._lock:
+            self._charts[key] = png
+            while len(self._charts) > self.maxsize:
+                self._charts.popitem(last=False)
+        return png
+
+    def __len__(self):
+        with self._lock:
+            return len(self._charts)
+
+
+def current_rss_mb():
+    with open("/proc/self/statm", encoding="utf-8") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def soak(renders=2000, cache_size=64, warmup=200, sample_every=250, seed=0):
+    """Render charts for random score vectors and sample RSS along the way
+
+    Most vectors are distinct, so this exercises rendering and LRU eviction
+    rather than cache hits. RSS is compared after a warmup that lets
+    matplotlib's font and glyph caches fill.
+    """
+    rng = np.random.default_rng(seed)
+    cache = RadarChartCache(cache_size)
+    samples = []
+    for i in range(warmup + renders):
+        scores = {category: int(rng.integers(0, len(items) * 3 + 1)) for category, items in sections.items()}
+        cache.get(scores)
+        if i >= warmup and (i - warmup) % sample_every == 0:
+            gc.collect()
+            samples.append({"render": i - warmup, "rss_mb": current_rss_mb()})
+    gc.collect()
+    samples.append({"render": renders, "rss_mb": current_rss_mb()})
+    return {
+        "renders": renders,
+        "cache_size": cache_size,
+        "cached_charts": len(cache),
+        "rss_start_mb": samples[0]["rss_mb"],
+        "rss_end_mb": samples[-1]["rss_mb"],
+        "rss_growth_mb": samples[-1]["rss_mb"] - samples[0]["rss_mb"],
+        "samples": samples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Radar chart rendering and memory soak check")
+    parser.add_argument("--soak", type=int, default=2000, help="Number of renders")
+    parser.add_argument("--cache-size", type=int, default=64)
+    parser.add_argument("--max-growth-mb", type=float, default=20.0,
+                        help="Fail if RSS grows more than this after warmup")
+    args = parser.parse_args()
+
+    report = soak(args.soak, args.cache_size)
+    print(json.dumps(report, indent=2))
+    if report["rss_growth_mb"] > args.max_growth_mb:
+        print(f"RSS grew {report['rss_growth_mb']:.1f} MB over {args.soak} renders", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""Self-help strategies and resource links for each assessment result
+
+The static content lives in a versioned JSON catalog that is loaded once and
+indexed by condition. When a search endpoint is configured, the condition's
+search terms are fetched concurrently over one pooled aiohttp session with a
+timeout; results are kept in a bounded TTL/LRU cache, and the catalog's links
+are used whenever the live lookup fails or returns nothing.
+
+The search endpoint is called as GET {search_url}?q=<term> and must return
+JSON of the form {"results": [{"title": ..., "link": ...}, ...]}.
+
+Usage:
+    python resources.py --check                     # run against a local stub server
+    python resources.py Anxiety --search-url http://localhost:8080/search
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import aiohttp
+
+from metrics import metrics
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resource_catalog.json")
+SUPPORTED_CATALOG_VERSIONS = (1,)
+
+
+@lru_cache(maxsize=None)
+def load_catalog(path=CATALOG_PATH):
+    """Catalog entries indexed by condition, built once per path
+
+    Each entry has the condition's search terms, its full strategy list
+    (common strategies followed by condition-specific ones) and its fallback
+    resource links, all as tuples so they can be shared between callers.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") not in SUPPORTED_CATALOG_VERSIONS:
+        raise ValueError(f"Unsupported resource catalog version {data.get('version')!r} in {path}")
+
+    common = tuple(data.get("common_strategies", []))
+    entries = {}
+    for condition, entry in data["conditions"].items():
+        entries[condition] = {
+            "search_terms": tuple(entry.get("search_terms", [])),
+            "strategies": common + tuple(entry.get("strategies", [])),
+            "resources": tuple(dict(resource) for resource in entry.get("resources", [])),
+        }
+    default = data.get("default_condition", "Normal")
+    if default not in entries:
+        raise ValueError(f"Default condition {default!r} missing from {path}")
+    return {"version": data["version"], "default_condition": default, "conditions": entries}
+
+
+def catalog_entry(condition, catalog=None):
+    """Catalog entry for condition, or the default condition's entry"""
+    catalog = catalog or load_catalog()
+    conditions = catalog["conditions"]
+    return conditions.get(condition, conditions[catalog["default_condition"]])
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a per-entry time to live"""
+
+    def __init__(self, maxsize=128, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class ResourceFetcher:
+    """Live resource lookups with catalog fallback
+
+    Streamlit runs scripts in plain threads, so the fetcher owns an event loop
+    in a daemon thread; the aiohttp session (and its connection pool) lives on
+    that loop and is reused by every lookup.
+    """
+
+    def __init__(self, search_url=None, catalog_path=CATALOG_PATH, timeout=3.0, max_connections=8,
+                 max_results=5, cache_size=128, ttl=3600, failure_ttl=60):
+        self.search_url = search_url
+        self.catalog = load_catalog(catalog_path)
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_results = max_results
+        # Failed lookups are cached briefly so a down endpoint doesn't cost a timeout per page
+        self.failure_ttl = failure_ttl
+        self.cache = TTLCache(cache_size, ttl)
+
+        self._lock = threading.Lock()
+        self._loop = None
+        self._session = None
+
+    def get(self, condition):
+        """Strategies and resource links for condition
+
+        "source" is "live" when the links came from the search endpoint and
+        "catalog" when they are the catalog's fallback links.
+        """
+        entry = catalog_entry(condition, self.catalog)
+        result = {"strategies": list(entry["strategies"]), "resources": list(entry["resources"]),
+                  "source": "catalog"}
+        if not self.search_url or not entry["search_terms"]:
+            return result
+
+        key = (self.catalog["version"], self.search_url, entry["search_terms"])
+        resources = self.cache.get(key)
+        metrics.cache("resources", hit=resources is not None)
+        if resources is None:
+            try:
+                future = asyncio.run_coroutine_threadsafe(self._fetch_all(entry["search_terms"]), self._event_loop())
+                resources = future.result(self.timeout + 1)
+            except Exception:
+                resources = ()
+            self.cache.put(key, resources, ttl=None if resources else self.failure_ttl)
+        if resources:
+            result.update(resources=list(resources), source="live")
+        return result
+
+    def close(self):
+        """Close the pooled session and stop the event loop thread"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), loop).result(self.timeout)
+            self._session = None
+        loop.call_soon_threadsafe(loop.stop)
+
+    def _event_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="resource-fetcher", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    async def _fetch_all(self, terms):
+        """Links for all terms fetched concurrently, deduplicated in term order"""
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        responses = await asyncio.gather(*(self._fetch(term) for term in terms), return_exceptions=True)
+
+        resources, seen = [], set()
+        for response in responses:
+            if isinstance(response, BaseException):
+                continue
+            for item in response:
+                link = item.get("link")
+                if not link or link in seen:
+                    continue
+                seen.add(link)
+                resources.append({"title": item.get("title") or link, "link": link})
+        return tuple(resources[:self.max_results])
+
+    async def _fetch(self, term):
+        async with self._session.get(self.search_url, params={"q": term}) as response:
+            response.raise_for_status()
+            data = await response.json(content_type=None)
+        return data.get("results", [])
+
+
+def _start_stub_server(delay=0.0, fail=False):
+    """Local search endpoint for --check; returns (server, url)"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            term = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+            time.sleep(delay)
+            if fail:
+                self.send_error(503)
+                return
+            body = json.dumps({"results": [
+                {"title": f"{term} guide", "link": f"https://example.org/{term.replace(' ', '-')}"},
+                {"title": "Shared page", "link": "https://example.org/shared"},
+            ]}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/search"
+
+
+def check(condition="Anxiety"):
+    """Exercise live fetching, caching and fallback against local stub servers"""
+    report = {}
+    entry = catalog_entry(condition)
+
+    # Terms are fetched concurrently: three 0.3s requests take ~0.3s, not 0.9s
+    server, url = _start_stub_server(delay=0.3)
+    fetcher = ResourceFetcher(url, timeout=2)
+    start = time.perf_counter()
+    live = fetcher.get(condition)
+    report["live_seconds"] = time.perf_counter() - start
+    assert live["source"] == "live", live
+    assert [r["link"] for r in live["resources"]].count("https://example.org/shared") == 1
+    assert report["live_seconds"] < 0.3 * len(entry["search_terms"]), report
+    start = time.perf_counter()
+    assert fetcher.get(condition) == live
+    report["cached_seconds"] = time.perf_counter() - start
+    fetcher.close()
+    server.shutdown()
+
+    # Errors and timeouts fall back to the catalog
+    for name, kwargs in (("error", {"fail": True}), ("timeout", {"delay": 1.0})):
+        server, url = _start_stub_server(**kwargs)
+        fetcher = ResourceFetcher(url, timeout=0.2)
+        start = time.perf_counter()
+        result = fetcher.get(condition)
+        report[f"{name}_fallback_seconds"] = time.perf_counter() - start
+        assert result["source"] == "catalog" and result["resources"] == list(entry["resources"]), result
+        fetcher.close()
+        server.shutdown()
+
+    # Without an endpoint nothing touches the network
+    offline = ResourceFetcher().get("Unknown condition")
+    assert offline["resources"] == list(catalog_entry("Normal")["resources"])
+    report["ok"] = True
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resource catalog and live resource lookups")
+    parser.add_argument("condition", nargs="?", default="Normal")
+    parser.add_argument("--search-url", help="Search endpoint returning {\"results\": [{\"title\", \"link\"}]}")
+    parser.add_argument("--timeout", type=float, default=3.0)
+    parser.add_argument("--check", action="store_true", help="Verify fetching, caching and fallback with a local stub server")
+    args = parser.parse_args()
+
+    if args.check:
+        print(json.dumps(check(), indent=2))
+        return
+    fetcher = ResourceFetcher(args.search_url, timeout=args.timeout)
+    print(json.dumps(fetcher.get(args.condition), indent=2, ensure_ascii=False))
+    fetcher.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""Run several Streamlit app workers that share one copy of the model weights
+
+The parent process loads the BERT classifier and the blenderbot pipeline once,
+freezes the garbage collector and then forks the workers. Inference never
+writes to the weights, so their pages stay shared copy-on-write between all
+workers; each extra worker only adds its own interpreter and activations.
+Missing chatbot explanations are generated once before the workers start, and
+each worker writes its own metrics file and port (see app.METRICS_FILE).
+Put a load balancer (nginx, haproxy, ...) in front of the worker ports.
+
+Usage (from the Main directory):
+    python shared_serving.py --workers 4 --base-port 8501
+    python shared_serving.py --measure --workers 4    # per-worker memory, shared vs separate
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import signal
+import sys
+
+import model_loading
+from explanations import ExplanationStore
+from model_loading import load_bert, load_chatbot, preloaded
+
+
+def preload_models(bert_path, chatbot_model, quantize_bert=False):
+    """Load both models into this process for forked workers to share"""
+    bert = load_bert(bert_path, quantize=quantize_bert)
+    chatbot = load_chatbot(chatbot_model)
+    preloaded[("bert", bert_path, quantize_bert)] = bert
+    preloaded[("chatbot", chatbot_model)] = chatbot
+    # Objects that survive until the fork are never scanned by the GC again,
+    # so collections in the workers don't dirty the pages holding them
+    gc.collect()
+    gc.freeze()
+    return bert, chatbot
+
+
+def prewarm_explanations(chatbot, generation_kwargs):
+    """Generate the missing cached explanations once, for all workers
+
+    Runs in a forked child so the parent never starts torch's thread pools
+    before forking the workers; they then find every explanation on disk.
+    """
+    pid = os.fork()
+    if pid == 0:
+        try:
+            ExplanationStore(chatbot, **generation_kwargs).prewarm().join()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+
+def memory_usage_mb(pid="self"):
+    """Rss, Pss (shared pages split between sharers) and private memory of a process"""
+    usage = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(":") in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                usage[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": usage.get("Rss", 0.0),
+        "pss_mb": usage.get("Pss", 0.0),
+        "private_mb": usage.get("Private_Clean", 0.0) + usage.get("Private_Dirty", 0.0),
+    }
+
+
+def run_worker(index, port):
+    """Run one Streamlit server for app.py in this (forked) process"""
+    from streamlit.web import bootstrap
+
+    model_loading.worker_index = index
+    # Same steps as `streamlit run app.py --server.port PORT --server.headless true`
+    flag_options = {"server_port": port, "server_headless": True}
+    bootstrap.load_config_options(flag_options)
+    bootstrap.run("app.py", False, [], flag_options)
+
+
+def serve(workers, base_port):
+    children = []
+    for i in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(i, base_port + i)
+            finally:
+                os._exit(0)
+        children.append(pid)
+        print(f"Worker {i} (pid {pid}) serving on port {base_port + i}")
+
+    def stop(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for pid in children:
+        os.waitpid(pid, 0)
+
+
+def _probe_worker(shared, bert_path, chatbot_model, quantize_bert, results, served, release):
+    """Serve one request with each model, then report memory while all workers are alive"""
+    import torch
+    from questionnaire import responses_to_text
+    from synthetic import synthetic_answers
+
+    if shared:
+        tokenizer, bert_model = preloaded[("bert", bert_path, quantize_bert)]
+        chatbot = preloaded[("chatbot", chatbot_model)]
+    else:
+        tokenizer, bert_model = load_bert(bert_path, quantize=quantize_bert)
+        chatbot = load_chatbot(chatbot_model)
+
+    text = responses_to_text(synthetic_answers(1, seed=os.getpid()).tolist()[0])
+    with torch.no_grad():
+        bert_model(**tokenizer(text, return_tensors="pt", truncation=True, max_length=512))
+    chatbot("How can I sleep better?", max_length=20)
+
+    served.wait()
+    results.put({"pid": os.getpid(), **memory_usage_mb()})
+    release.wait()
+
+
+def measure(workers, shared, bert_path, chatbot_model, quantize_bert=False):
+    """Fork workers that each serve a request and report per-worker and total memory"""
+    if shared:
+        preload_models(bert_path, chatbot_model, quantize_bert)
+
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    served = context.Barrier(workers)
+    release = context.Barrier(workers + 1)
+    processes = [context.Process(target=_probe_worker, args=(shared, bert_path, chatbot_model, quantize_bert,
+                                                             results, served, release))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    per_worker = [results.get() for _ in processes]
+    parent = memory_usage_mb()
+    release.wait()
+    for process in processes:
+        process.join()
+
+    total_pss = parent["pss_mb"] + sum(w["pss_mb"] for w in per_worker)
+    return {
+        "mode": "shared" if shared else "separate",
+        "workers": workers,
+        "parent": parent,
+        "per_worker": per_worker,
+        "total_pss_mb": total_pss,
+        "mean_worker_private_mb": sum(w["private_mb"] for w in per_worker) / workers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamlit workers sharing copy-on-write model weights")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--base-port", type=int, default=8501)
+    parser.add_argument("--measure", action="store_true",
+                        help="Report per-worker memory with shared vs separately loaded weights")
+    # The app only reuses preloaded weights for the models it is configured with
+    parser.add_argument("--bert-path", help="Classifier directory for --measure (default: the app's)")
+    parser.add_argument("--chatbot-model", help="Chatbot model for --measure (default: the app's)")
+    args = parser.parse_args()
+
+    # Same models the app would load, so its ModelLoader finds them preloaded
+    import app
+    bert_path = args.bert_path or app.bert_model_path()
+    chatbot_model = args.chatbot_model or app.CHATBOT_MODEL
+    quantize_bert = app.BERT_INT8_QUANTIZATION
+
+    if args.measure:
+        # Separate first: the shared run preloads into this process
+        reports = [measure(args.workers, False, bert_path, chatbot_model, quantize_bert),
+                   measure(args.workers, True, bert_path, chatbot_model, quantize_bert)]
+        print(json.dumps(reports, indent=2))
+        separate, shared = reports
+        print(f"Total memory for {args.workers} workers: {separate['total_pss_mb']:.0f} MB separate, "
+              f"{shared['total_pss_mb']:.0f} MB shared; private memory per shared worker "
+              f"{shared['mean_worker_private_mb']:.0f} MB", file=sys.stderr)
+        return
+
+    _, chatbot = preload_models(app.bert_model_path(), app.CHATBOT_MODEL, quantize_bert)
+    prewarm_explanations(chatbot, app.explanation_generation_kwargs())
+    serve(args.workers, args.base_port)
+
+
+if __name__ == '__main__':
+    main()
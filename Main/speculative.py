@@ -0,0 +1,148 @@
+"""Speculative results computation while the user is still answering
+
+Once the user reaches the last section, the results stages are started in the
+background for the current answers. Stages are submitted as futures (the BERT
+request goes straight into the shared micro-batching queue), so speculation
+holds no thread while it waits. Every answer change cancels the previous job
+and starts a new one; on submit the results page takes whatever stages have
+finished for exactly the submitted answers and computes the rest itself.
+"""
+
+import threading
+from concurrent.futures import Future
+
+from questionnaire import responses_key
+
+
+def chain(future, fn, cancel_source=True):
+    """Future of fn(future.result()), following fn's result when that is a Future
+
+    Cancelling the returned future cancels whichever future it is waiting on;
+    pass cancel_source=False when future is shared (e.g. a model load).
+    """
+    result = Future()
+    waiting = [future if cancel_source else None]
+
+    def follow(inner):
+        if inner.cancelled():
+            result.cancel()
+        elif result.set_running_or_notify_cancel():
+            if inner.exception() is not None:
+                result.set_exception(inner.exception())
+            else:
+                result.set_result(inner.result())
+
+    def done(source):
+        if source.cancelled():
+            result.cancel()
+        if result.cancelled():
+            return
+        try:
+            value = fn(source.result())
+        except Exception as e:
+            if result.set_running_or_notify_cancel():
+                result.set_exception(e)
+            return
+        if isinstance(value, Future):
+            waiting[0] = value
+            if result.cancelled():
+                value.cancel()
+            value.add_done_callback(follow)
+        elif result.set_running_or_notify_cancel():
+            result.set_result(value)
+
+    def cancelled(r):
+        if r.cancelled() and waiting[0] is not None:
+            waiting[0].cancel()
+
+    result.add_done_callback(cancelled)
+    future.add_done_callback(done)
+    return result
+
+
+class _Job:
+    def __init__(self, responses):
+        self.responses = responses
+        self.results = {}
+        self.next = 0
+        self.future = None
+        self.cancelled = False
+
+
+class SpeculativeRunner:
+    """Start results stages for the latest answers, one after the other
+
+    stages is a list of (name, start) pairs; start is called with the answers
+    and the stages computed so far, must not touch Streamlit, and returns a
+    Future of the stage's value. A stage that can't run (start returns None,
+    or its value is None) ends the job and is left for the results page.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.key = None
+        self._job = None
+        self._lock = threading.Lock()
+
+    def update(self, responses):
+        """Start speculating on these answers unless that job is already running"""
+        key = responses_key(responses)
+        if key == self.key:
+            return
+        self.cancel()
+        job = _Job(list(responses))
+        if not self._start(job):
+            # e.g. the model is still loading, try again on the next update
+            return
+        with self._lock:
+            self.key = key
+            self._job = job
+
+    def cancel(self):
+        """Drop the current job, cancelling its pending stage"""
+        with self._lock:
+            job, self._job, self.key = self._job, None, None
+            if job is not None:
+                job.cancelled = True
+        if job is not None and job.future is not None:
+            job.future.cancel()
+
+    def take(self, responses):
+        """Stages already computed for exactly these answers, without waiting
+
+        The rest of the job is cancelled and left to the results page. Returns
+        None when there is no matching job or nothing has finished yet.
+        """
+        with self._lock:
+            job = self._job
+            if job is None or responses_key(responses) != self.key:
+                return None
+            results = dict(job.results)
+        self.cancel()
+        return results or None
+
+    def _start(self, job):
+        """Start job's next stage; returns False if it couldn't be started"""
+        with self._lock:
+            if job.cancelled or job.next == len(self.stages):
+                return True
+            name, start = self.stages[job.next]
+            try:
+                future = start(job.responses, dict(job.results))
+            except Exception:
+                future = None
+            if future is None:
+                return False
+            job.future = future
+        future.add_done_callback(lambda f: self._finish(job, name, f))
+        return True
+
+    def _finish(self, job, name, future):
+        if future.cancelled() or future.exception() is not None or future.result() is None:
+            return
+        with self._lock:
+            if job.cancelled:
+                return
+            job.results[name] = future.result()
+            job.next += 1
+        self._start(job)
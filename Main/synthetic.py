@@ -0,0 +1,21 @@
+"""Seeded synthetic questionnaire answers for benchmarks and parity checks"""
+
+import numpy as np
+
+from questionnaire import questions, sections
+
+
+def synthetic_answers(n, seed=0):
+    """Generate an (n x 35) uint8 answer matrix with realistic structure
+
+    Each respondent gets an overall severity plus a per-section severity, and
+    each answer is drawn from Binomial(3, severity), so section scores are
+    correlated and the threshold conditions all show up.
+    """
+    rng = np.random.default_rng(seed)
+    overall = rng.beta(1.2, 3.0, size=(n, 1))
+    severity = np.empty((n, len(questions)))
+    for indices in sections.values():
+        section = rng.beta(1.2, 3.0, size=(n, 1))
+        severity[:, indices] = 0.6 * overall + 0.4 * section
+    return rng.binomial(3, severity).astype(np.uint8)
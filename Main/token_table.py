@@ -0,0 +1,100 @@
+"""Precomputed token IDs for the fixed questionnaire text
+
+responses_to_text only ever combines the same 35 questions with the same 4
+frequency labels, so every (question, answer) pair is tokenized once at load
+time and model inputs are built by concatenating the stored token IDs. The
+per-question compact encodings ("nonzero" and "keys") work the same way.
+"""
+
+import numpy as np
+import torch
+
+from questionnaire import questions, frequency_labels, response_segment, encode_responses
+
+
+class TokenTable:
+    """Build BERT inputs for answer vectors without running the tokenizer
+
+    Only valid for tokenizers that split on whitespace before sub-word
+    tokenization (BERT WordPiece does); call verify() before relying on it.
+    """
+
+    def __init__(self, tokenizer, max_length=512, mode="full"):
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.mode = mode
+        self.max_content = max_length - tokenizer.num_special_tokens_to_add(pair=False)
+        self.input_names = list(tokenizer.model_input_names)
+        self.pad_token_id = tokenizer.pad_token_id
+
+        # Special tokens the tokenizer wraps around a single sequence ([CLS] ... [SEP] for BERT)
+        sample = f"{questions[0]}: {frequency_labels[0]}"
+        plain = tokenizer(sample, add_special_tokens=False)["input_ids"]
+        wrapped = tokenizer(sample)["input_ids"]
+        start = next(i for i in range(len(wrapped)) if wrapped[i:i + len(plain)] == plain)
+        self.prefix = np.asarray(wrapped[:start], dtype=np.int64)
+        self.suffix = np.asarray(wrapped[start + len(plain):], dtype=np.int64)
+
+        # One flat buffer with the token IDs of every "question: label" segment
+        segments = []
+        for index in range(len(questions)):
+            for answer in range(len(frequency_labels)):
+                segment = response_segment(index, answer, mode)
+                ids = tokenizer(segment, add_special_tokens=False)["input_ids"] if segment else []
+                segments.append(np.asarray(ids, dtype=np.int64))
+        lengths = np.array([len(ids) for ids in segments])
+        self.flat = np.concatenate(segments)
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).reshape(len(questions), len(frequency_labels))
+        self.lengths = lengths.reshape(len(questions), len(frequency_labels))
+
+    def encode_ids(self, responses):
+        """Token IDs (with special tokens and truncation) for one answer vector"""
+        answers = np.minimum(np.asarray(responses), 3)
+        rows = np.arange(len(questions))
+        starts = self.offsets[rows, answers]
+        ends = starts + self.lengths[rows, answers]
+        content = np.concatenate([self.flat[s:e] for s, e in zip(starts, ends)])[:self.max_content]
+        return np.concatenate([self.prefix, content, self.suffix])
+
+    def encode_batch(self, batch):
+        """Padded model inputs for a list of answer vectors, same as tokenizer(texts, padding=True)"""
+        encoded = [self.encode_ids(responses) for responses in batch]
+        width = max(len(ids) for ids in encoded)
+
+        input_ids = np.full((len(encoded), width), self.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(encoded), width), dtype=np.int64)
+        for i, ids in enumerate(encoded):
+            input_ids[i, :len(ids)] = ids
+            attention_mask[i, :len(ids)] = 1
+
+        inputs = {"input_ids": torch.from_numpy(input_ids)}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = torch.zeros_like(inputs["input_ids"])
+        if "attention_mask" in self.input_names:
+            inputs["attention_mask"] = torch.from_numpy(attention_mask)
+        return inputs
+
+    def verify(self, n_samples=200, batch_size=8, seed=0):
+        """Check the table against the tokenizer on random answer vectors
+
+        Returns True only if every tensor is byte-identical to the tokenizer
+        output, both for single inputs and for padded batches.
+        """
+        rng = np.random.default_rng(seed)
+        samples = rng.integers(0, len(frequency_labels), size=(n_samples, len(questions))).tolist()
+        # Include the shortest and longest possible texts
+        samples[:2] = [[0] * len(questions), [2] * len(questions)]
+
+        for start in range(0, n_samples, batch_size):
+            for batch in ([samples[start]], samples[start:start + batch_size]):
+                texts = [encode_responses(responses, self.mode) for responses in batch]
+                expected = self.tokenizer(texts, return_tensors="pt", truncation=True, padding=True,
+                                          max_length=self.max_length)
+                actual = self.encode_batch(batch)
+                if set(expected.keys()) != set(actual.keys()):
+                    return False
+                for key in expected:
+                    a, b = expected[key], actual[key]
+                    if a.shape != b.shape or a.dtype != b.dtype or a.numpy().tobytes() != b.numpy().tobytes():
+                        return False
+        return True